@@ -0,0 +1,118 @@
+"""Cold start of each studio deployment: eager graph modules vs lazy graph factories.
+
+    python benchmarks/cold_start.py --runs 5
+
+Starts a fresh interpreter per studio dir and run, the way a server worker boots, and
+times two phases from the first line of the child:
+  boot           registering every langgraph.json entry. "eager" imports every graph
+                 module, as the old ./<module>.py:graph entries did; "lazy" imports
+                 graphs.py, as the ./graphs.py:<name> entries do
+  first request  boot, then building one graph and running it to the end
+The real clients are imported and built; the OpenAI API is served by a local HTTP
+server that answers every request at once (JSON matching the response format when one
+is asked for), so the numbers are import and build time, not the network.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fakes import _fake_value
+from studio import ROOT
+
+# First request per studio dir: (graph name, input)
+FIRST_REQUEST = {
+    "module-1": ("agent", {"messages": [{"role": "user", "content": "Add 3 and 4."}]}),
+    "module-2": ("chatbot", {"messages": [{"role": "user", "content": "Hi, I'm Lance."}]}),
+    "module-3": ("agent", {"messages": [{"role": "user", "content": "Add 3 and 4."}]}),
+    "module-4": ("map_reduce", {"topic": "animals"}),
+}
+
+CHILD = """
+import time
+started = time.perf_counter()
+import json, sys
+studio_dir, mode, name, inputs = sys.argv[1:]
+sys.path.insert(0, studio_dir)
+import graphs
+if mode == "eager":
+    import importlib
+    for factory in graphs.graphs.values():
+        try:
+            importlib.import_module(factory.target[0])
+        except Exception:
+            pass
+boot = time.perf_counter() - started
+graph = graphs.graphs[name]({})
+if getattr(graph, "interrupt_before_nodes", None) or getattr(graph, "interrupt_after_nodes", None):
+    graph = graph.builder.compile()
+graph.invoke(json.loads(inputs), {"configurable": {"thread_id": "cold-start"}})
+print(json.dumps({"boot": boot, "first_request": time.perf_counter() - started}))
+"""
+
+
+class OpenAIHandler(BaseHTTPRequestHandler):
+    """ Chat completions answered locally """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(_fake_value(schema, schema.get("$defs", {}), "value", 2))
+        else:
+            content = "Done."
+        reply = json.dumps({
+            "id": "chatcmpl-local", "object": "chat.completion", "created": 0, "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+def cold_start(module: str, mode: str, env: dict) -> dict:
+    name, inputs = FIRST_REQUEST[module]
+    studio_dir = ROOT / module / "studio"
+    completed = subprocess.run([sys.executable, "-c", CHILD, str(studio_dir), mode, name, json.dumps(inputs)],
+                               cwd=studio_dir, env=env, capture_output=True, text=True)
+    if completed.returncode:
+        raise RuntimeError(f"{module} {mode}: {completed.stderr.strip().splitlines()[-1]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="*", default=list(FIRST_REQUEST))
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    env = dict(os.environ, OPENAI_API_KEY="offline", TAVILY_API_KEY="offline", LLM_CACHE="off",
+               OPENAI_BASE_URL=base_url, OPENAI_API_BASE=base_url)
+    env.pop("LANGGRAPH_WARM_UP", None)
+
+    print(f"{'module':<9} {'graph':<11} {'mode':<6} {'boot ms':>8} {'first request ms':>16}")
+    for module in args.modules:
+        for mode in ("eager", "lazy"):
+            runs = [cold_start(module, mode, env) for _ in range(args.runs)]
+            boot = statistics.median(run["boot"] for run in runs) * 1000
+            first = statistics.median(run["first_request"] for run in runs) * 1000
+            print(f"{module:<9} {FIRST_REQUEST[module][0]:<11} {mode:<6} {boot:>8.0f} {first:>16.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Database size and history query latency of long-lived chatbot threads, with and without compaction.
+
+    python benchmarks/compaction.py --threads 20 --rounds 10 --turns 10
+
+Each round runs `--turns` more turns on every thread (a TunedSqliteSaver database),
+then, for the compacted run, one CheckpointCompactor pass. After each round it
+reports the database size and how long get_state_history takes for one thread.
+Without compaction both keep growing; with it they level off.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage
+
+import langchain_openai
+from fakes import FakeChatModel
+from studio import load_studio_module
+
+
+def database_size(path: str) -> float:
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--keep-last", type=int, default=20)
+    parser.add_argument("--keyframe-every", type=int, default=50)
+    args = parser.parse_args()
+
+    langchain_openai.ChatOpenAI = lambda **kwargs: FakeChatModel(output_tokens=100)
+    chatbot = load_studio_module("module-2", "chatbot")
+    tuned = load_studio_module("module-2", "sqlite_checkpointer")
+    compaction = load_studio_module("module-2", "compaction")
+
+    print(f"{'mode':<10} {'round':>5} {'MiB':>6} {'history':>8} {'history ms':>10} {'compaction s':>12}")
+    for mode in ("plain", "compacted"):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "example.db")
+            with tuned.TunedSqliteSaver.from_path(path) as saver:
+                graph = chatbot.workflow.compile(checkpointer=saver)
+                compactor = compaction.CheckpointCompactor(path, keep_last=args.keep_last,
+                                                           keyframe_every=args.keyframe_every, pause=0)
+                for round in range(args.rounds):
+                    for thread in range(args.threads):
+                        config = {"configurable": {"thread_id": f"thread-{thread}", "summarization": "inline"}}
+                        for turn in range(args.turns):
+                            graph.invoke({"messages": [HumanMessage(content=f"Turn {turn} " + "some words " * 100)]}, config)
+                    seconds = compactor.run_once()["seconds"] if mode == "compacted" else 0.0
+
+                    config = {"configurable": {"thread_id": "thread-0"}}
+                    start = time.perf_counter()
+                    history = list(graph.get_state_history(config))
+                    elapsed = (time.perf_counter() - start) * 1000
+                    # The latest state is untouched by compaction
+                    assert graph.get_state(config).values["messages"]
+                    print(f"{mode:<10} {round:>5} {database_size(path):>6.1f} {len(history):>8} {elapsed:>10.1f} {seconds:>12.2f}")
+                compactor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Connections opened by the LLM and search clients: per-client defaults vs the shared pool.
+
+    python benchmarks/connection_reuse.py --bursts 5 --concurrency 16
+
+Serves the OpenAI and Tavily APIs from a local keep-alive HTTP/1.1 server that counts the
+TCP connections it accepts (each one a TLS handshake against the real APIs). Sends bursts
+of concurrent requests, sync (threads) and async, through:
+  default  one ChatOpenAI per studio model with its own default client, and
+           TavilySearchResults as shipped (a new connection per search)
+  shared   the same models and search tool on http_clients from module-4
+Reports connections accepted, requests served and wall time, and checks the shared
+clients' own metrics against the server's count.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import langchain_community.utilities.tavily_search as tavily_search
+from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_openai.chat_models.base import ChatOpenAI
+
+from cold_start import OpenAIHandler
+from studio import load_studio_module
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class Handler(OpenAIHandler):
+    """ OpenAI chat completions and Tavily search over keep-alive connections """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.path != "/search":
+            return super().do_POST()
+        self.rfile.read(int(self.headers["Content-Length"]))
+        reply = json.dumps({"results": [{"title": "Example", "url": "https://example.com", "content": "fake result", "score": 1.0}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--models", type=int, default=4, help="ChatOpenAI instances, one per studio model")
+    args = parser.parse_args()
+
+    server = CountingServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    tavily_search.TAVILY_API_URL = base_url
+    retrieval = load_studio_module("module-4", "retrieval")
+    retrieval.TAVILY_API_URL = base_url
+    import http_clients
+    shared = http_clients.http_clients
+
+    def clients(mode: str):
+        kwargs = {"http_client": shared.client, "http_async_client": shared.async_client} if mode == "shared" else {}
+        # Distinct timeouts, as graphs tune their models, give each default model its own pool
+        models = [ChatOpenAI(model="gpt-4o", api_key="offline", base_url=f"{base_url}/v1", timeout=30 + i, **kwargs)
+                  for i in range(args.models)]
+        wrapper = retrieval.PooledTavilySearchAPIWrapper() if mode == "shared" else tavily_search.TavilySearchAPIWrapper()
+        return models, TavilySearchResults(max_results=3, api_wrapper=wrapper)
+
+    # Every model and the search tool get the same share of each burst
+    per_client = max(1, args.concurrency // (args.models + 1))
+    # One loop for every async burst, as in the server
+    loop = asyncio.new_event_loop()
+
+    print(f"{'mode':<8} {'api':<6} {'connections':>11} {'requests':>8} {'wall s':>7}")
+    for mode in ("default", "shared"):
+        for api in ("sync", "async"):
+            models, search = clients(mode)
+            before = shared.metrics()
+            server.connections = server.requests = 0
+            started = time.perf_counter()
+            for _ in range(args.bursts):
+                if api == "sync":
+                    jobs = [lambda model=model: model.invoke("hi") for model in models] + [lambda: search.invoke("query")]
+                    with ThreadPoolExecutor(max_workers=len(jobs) * per_client) as executor:
+                        list(executor.map(lambda job: job(), jobs * per_client))
+                else:
+                    async def burst():
+                        await asyncio.gather(*[client.ainvoke("hi" if client is not search else "query")
+                                               for client in (models + [search]) * per_client])
+
+                    loop.run_until_complete(burst())
+            wall = time.perf_counter() - started
+            print(f"{mode:<8} {api:<6} {server.connections:>11} {server.requests:>8} {wall:>7.2f}")
+            if mode == "shared":
+                after = shared.metrics()
+                assert after["connections_opened"] - before["connections_opened"] == server.connections, after
+                assert after["requests"] - before["requests"] == server.requests, after
+    print()
+    print(shared.render(), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Bytes written by the interview sub-graph's checkpoints, with and without delta checkpoints.
+
+    python benchmarks/delta_checkpoint.py --turns 5 10 20 40
+
+Runs one interview of `--turns` question / answer rounds against MemorySaver and
+SqliteSaver, each plain and wrapped in DeltaCheckpointSaver, and checks that the
+state read back from the delta saver matches the plain one.
+"""
+import argparse
+import sqlite3
+import time
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from fakes import FakeChatModel, FakeTavilySearch, FakeWikipediaLoader
+from studio import load_studio_module
+
+
+class CountingSerializer(JsonPlusSerializer):
+    """ Counts the bytes of everything serialized for storage """
+
+    bytes_written = 0
+
+    def dumps_typed(self, obj):
+        type_, data = super().dumps_typed(obj)
+        self.bytes_written += len(data)
+        return type_, data
+
+
+def run(ra, saver, turns: int) -> tuple:
+    graph = ra.interview_builder.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": f"interview-{turns}"}, "recursion_limit": 10 * turns + 20}
+    analyst = ra.Analyst(affiliation="Lab", name="Ada", role="Researcher", description="Checkpoint costs")
+    start = time.perf_counter()
+    graph.invoke({"analyst": analyst, "max_num_turns": turns, "messages": [HumanMessage(content="Hello")]}, config)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    history = [snapshot.values for snapshot in graph.get_state_history(config)]
+    read = time.perf_counter() - start
+    return elapsed, read, history
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 10, 20, 40])
+    parser.add_argument("--snapshot-every", type=int, default=20)
+    args = parser.parse_args()
+
+    ra = load_studio_module("module-4", "research_assistant")
+    import retrieval
+    from delta_checkpoint import DeltaCheckpointSaver
+    ra.llm = FakeChatModel(output_tokens=200)
+    retrieval.TavilySearchResults = FakeTavilySearch
+    retrieval.WikipediaLoader = FakeWikipediaLoader
+
+    savers = {
+        "memory": lambda serde: MemorySaver(serde=serde),
+        "sqlite": lambda serde: SqliteSaver(sqlite3.connect(":memory:", check_same_thread=False), serde=serde),
+    }
+    print(f"{'saver':<8} {'turns':>5} {'plain bytes':>12} {'delta bytes':>12} {'ratio':>6} {'plain write':>11} {'delta write':>11} {'delta read':>10}")
+    for name, make in savers.items():
+        for turns in args.turns:
+            plain_serde, delta_serde = CountingSerializer(), CountingSerializer()
+            plain_write, _, plain_history = run(ra, make(plain_serde), turns)
+            delta_saver = DeltaCheckpointSaver(make(delta_serde), snapshot_every=args.snapshot_every)
+            delta_write, delta_read, delta_history = run(ra, delta_saver, turns)
+            assert [[m.content for m in v.get("messages", [])] for v in plain_history] == [[m.content for m in v.get("messages", [])] for v in delta_history]
+            assert [v.get("context") for v in plain_history] == [v.get("context") for v in delta_history]
+            ratio = delta_serde.bytes_written / plain_serde.bytes_written
+            print(f"{name:<8} {turns:>5} {plain_serde.bytes_written:>12} {delta_serde.bytes_written:>12} {ratio:>6.2f} "
+                  f"{plain_write:>10.3f}s {delta_write:>10.3f}s {delta_read:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
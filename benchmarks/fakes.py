@@ -0,0 +1,233 @@
+"""Offline stand-ins for the chat model and search clients used by the studio graphs.
+
+The fakes answer instantly (or after a configurable latency) without any network
+access, so the studio graphs can be exercised and timed without API keys.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Callable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def _fake_value(schema: dict, defs: dict, name: str, list_size: int, string_tokens: int = 2):
+    """ Build a placeholder value that satisfies a JSON schema """
+
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs, name, list_size, string_tokens)
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return _fake_value(options[0], defs, name, list_size, string_tokens)
+
+    kind = schema.get("type", "string")
+    if kind == "object":
+        return {
+            key: _fake_value(value, defs, key, list_size, string_tokens)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [
+            _fake_value(schema.get("items", {}), defs, f"{name} {i}", list_size, string_tokens)
+            for i in range(list_size)
+        ]
+    if kind == "integer":
+        return 0
+    if kind == "number":
+        return 0.0
+    if kind == "boolean":
+        return False
+    return " ".join([f"fake {name}"] + ["token"] * (string_tokens - 2))
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with configurable latency and output size.
+
+    Plain calls return `output_tokens` words of text after `latency` seconds plus
+    `prompt_token_latency` per prompt token and `token_latency` per output token; when
+    streamed, the first two make up the time to first token. `prompt_tokens` and `completion_tokens` add up the usage of every call.
+
+    When tools are bound (which is also how `with_structured_output` works) the reply
+    is a call to the first tool with placeholder arguments built from its schema,
+    except that an agent (tool choice not forced) answers in text once it has seen a
+    tool result. Pass `responder` to script the replies instead, e.g. to replay an
+    agent trace.
+
+    `requests` counts provider round trips. With `native_batch`, batch / abatch act like a
+    provider batch endpoint: one request and one `latency` for the whole batch.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    prompt_token_latency: float = 0.0
+    output_tokens: int = 20
+    string_tokens: int = 2
+    list_size: int = 3
+    responder: Optional[Callable[[List[BaseMessage], dict], AIMessage]] = None
+    native_batch: bool = False
+    calls: int = 0
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": "fake", "output_tokens": self.output_tokens}
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        formatted_tools = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted_tools, tool_choice=tool_choice, **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        self.calls += 1
+        if self.responder is not None:
+            message = self.responder(messages, kwargs)
+        elif kwargs.get("tools") and not (kwargs.get("tool_choice") is None and isinstance(messages[-1], ToolMessage)):
+            function = kwargs["tools"][0]["function"]
+            parameters = function.get("parameters", {})
+            args = _fake_value(parameters, parameters.get("$defs", {}), function["name"], self.list_size, self.string_tokens)
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": function["name"], "args": args, "id": f"call_{self.calls}"}],
+            )
+        else:
+            message = AIMessage(content=" ".join(f"token{i}" for i in range(self.output_tokens)))
+
+        # Report usage the same way ChatOpenAI does
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(str(message.content or [call["args"] for call in message.tool_calls]).split())
+        self.prompt_tokens += input_tokens
+        self.completion_tokens += output_tokens
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        message.usage_metadata = usage
+        message.response_metadata = {
+            "model_name": "fake",
+            "token_usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": usage["total_tokens"]},
+        }
+        return message
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        if not self.native_batch:
+            return super().batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        self.requests += 1
+        time.sleep(self.latency)
+        return super().batch(inputs, config, return_exceptions=return_exceptions, in_batch=True, **kwargs)
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        if not self.native_batch:
+            return await super().abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return await super().abatch(inputs, config, return_exceptions=return_exceptions, in_batch=True, **kwargs)
+
+    def _request(self, message: AIMessage, in_batch: bool) -> float:
+        """ Count a request and return its time to first token; a batch pays `latency` once, in batch / abatch """
+        prefill = self.prompt_token_latency * message.usage_metadata["input_tokens"]
+        if in_batch:
+            return prefill
+        self.requests += 1
+        return self.latency + prefill
+
+    def _generate(self, messages, stop=None, run_manager=None, in_batch=False, **kwargs) -> ChatResult:
+        message = self._reply(messages, **kwargs)
+        time.sleep(self._request(message, in_batch) + self.token_latency * message.usage_metadata["output_tokens"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, in_batch=False, **kwargs) -> ChatResult:
+        message = self._reply(messages, **kwargs)
+        await asyncio.sleep(self._request(message, in_batch) + self.token_latency * message.usage_metadata["output_tokens"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> List[ChatGenerationChunk]:
+        """ Split a reply into streamed chunks, usage attached to the last one """
+        if message.tool_calls:
+            chunks = [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ])]
+        else:
+            words = str(message.content).split(" ")
+            chunks = [AIMessageChunk(content=word if i == 0 else f" {word}") for i, word in enumerate(words)]
+        chunks[-1].usage_metadata = message.usage_metadata
+        chunks[-1].response_metadata = message.response_metadata
+        return [ChatGenerationChunk(message=chunk) for chunk in chunks]
+
+    def _stream(self, messages, stop=None, run_manager=None, in_batch=False, **kwargs):
+        message = self._reply(messages, **kwargs)
+        time.sleep(self._request(message, in_batch))
+        for i, chunk in enumerate(self._chunks(message)):
+            if i:
+                time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, in_batch=False, **kwargs):
+        message = self._reply(messages, **kwargs)
+        await asyncio.sleep(self._request(message, in_batch))
+        for i, chunk in enumerate(self._chunks(message)):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class FakeTavilySearch:
+    """Drop-in for `TavilySearchResults` returning canned results after `latency` seconds."""
+
+    latency: float = 0.0
+    calls: int = 0
+
+    def __init__(self, max_results: int = 3, **kwargs: Any):
+        self.max_results = max_results
+
+    def _results(self, query: str) -> List[dict]:
+        type(self).calls += 1
+        return [
+            {"url": f"https://example.com/{i}?q={query}", "content": f"Result {i} for {query}"}
+            for i in range(self.max_results)
+        ]
+
+    def invoke(self, query: str, config=None) -> List[dict]:
+        time.sleep(self.latency)
+        return self._results(query)
+
+    async def ainvoke(self, query: str, config=None) -> List[dict]:
+        await asyncio.sleep(self.latency)
+        return self._results(query)
+
+
+class FakeWikipediaLoader:
+    """Drop-in for `WikipediaLoader` returning canned pages after `latency` seconds."""
+
+    latency: float = 0.0
+    calls: int = 0
+
+    def __init__(self, query: str, load_max_docs: int = 2, **kwargs: Any):
+        self.query = query
+        self.load_max_docs = load_max_docs
+
+    def _documents(self) -> List[Document]:
+        type(self).calls += 1
+        return [
+            Document(page_content=f"Page {i} about {self.query}", metadata={"source": f"https://en.wikipedia.org/wiki/{i}"})
+            for i in range(self.load_max_docs)
+        ]
+
+    def load(self) -> List[Document]:
+        time.sleep(self.latency)
+        return self._documents()
+
+    async def aload(self) -> List[Document]:
+        await asyncio.sleep(self.latency)
+        return self._documents()
+
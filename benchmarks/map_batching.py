@@ -0,0 +1,72 @@
+"""Requests and latency of the map_reduce joke fan-out, per item vs batched.
+
+    python benchmarks/map_batching.py --subjects 200 --llm-latency 0.2
+
+Runs the module-4 map_reduce graph (async) on a fake model, for the per-item mode and a
+few batch sizes and wait windows. Reports provider requests, batches formed, wall time and
+the slowest joke branch. The limiters are opened up so the batch size, not the limiter,
+bounds a batch.
+
+By default the fake batches like ChatOpenAI: batch / abatch send one request per item,
+concurrently, so batch mode sends as many requests as item mode and only adds latency.
+--native-batch models a provider batch endpoint (one request per batch) instead, to show
+what batch mode gains with a model that has one.
+"""
+import argparse
+import asyncio
+import time
+
+import langchain_openai
+from fakes import FakeChatModel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--batch-waits", type=float, nargs="+", default=[0.005, 0.05])
+    parser.add_argument("--native-batch", action="store_true", help="fake a provider batch endpoint instead of ChatOpenAI's per-item batch")
+    args = parser.parse_args()
+
+    fake = FakeChatModel(latency=args.llm_latency, native_batch=args.native_batch, list_size=args.subjects)
+    langchain_openai.ChatOpenAI = lambda **kwargs: fake
+    from studio import load_studio_module
+    map_reduce = load_studio_module("module-4", "map_reduce")
+    import scheduler
+    scheduler.configure_limiter("map_reduce", args.subjects)
+    scheduler.configure_limiter("openai", args.subjects)
+    # Every run would otherwise be served from the response cache
+    map_reduce.model.cache = None
+
+    runs = [("item", {})] + [
+        ("batch", {"batch_size": size, "batch_wait": wait}) for size in args.batch_sizes for wait in args.batch_waits
+    ]
+    if args.native_batch:
+        print("Fake provider batch endpoint: one request per batch")
+    else:
+        print("ChatOpenAI-like batch: one request per item, so batch mode saves no requests")
+    print(f"{'mode':<6} {'size':>5} {'wait s':>7} {'requests':>8} {'batches':>7} {'wall s':>7} {'slowest branch s':>16}")
+    for mode, knobs in runs:
+        fake.requests = 0
+        batches = map_reduce.joke_batcher.metrics()["batches"]
+        config = {"configurable": {"map_mode": mode, **knobs}}
+
+        async def run():
+            branch_seconds = []
+            started = time.perf_counter()
+            async for event in map_reduce.graph.astream_events({"topic": "animals"}, config, version="v2"):
+                if event["name"] == "generate_joke" and event["event"] in ("on_chain_start", "on_chain_end"):
+                    branch_seconds.append((event["run_id"], event["event"], time.perf_counter()))
+            starts = {run_id: at for run_id, kind, at in branch_seconds if kind == "on_chain_start"}
+            slowest = max(at - starts[run_id] for run_id, kind, at in branch_seconds if kind == "on_chain_end")
+            return time.perf_counter() - started, slowest
+
+        wall, slowest = asyncio.run(run())
+        batched = map_reduce.joke_batcher.metrics()["batches"] - batches
+        print(f"{mode:<6} {knobs.get('batch_size', 1):>5} {knobs.get('batch_wait', 0):>7} {fake.requests:>8} "
+              f"{batched:>7} {wall:>7.2f} {slowest:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the research assistant's report writer layouts offline.
+
+    python benchmarks/report_writers.py --sections 6 --section-tokens 400
+
+Writes the introduction, report body and conclusion from synthetic memos with
+each writer_mode: "separate" (three calls), "shared_prefix" (three calls whose
+prompts start with the same memos) and "combined" (one structured-output call).
+Reports calls, prompt tokens, the prompt tokens a provider prompt cache could
+serve, completion tokens and wall-clock time.
+"""
+import argparse
+import asyncio
+import time
+
+from fakes import FakeChatModel
+from studio import load_studio_module
+
+
+async def write(ra, state: dict, mode: str):
+    config = {"configurable": {"writer_mode": mode}}
+    if mode == "combined":
+        return await ra.awrite_combined(state)
+    return await asyncio.gather(
+        ra.awrite_report(state, config), ra.awrite_introduction(state, config), ra.awrite_conclusion(state, config)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--section-tokens", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds per output token")
+    parser.add_argument("--part-tokens", type=int, default=200, help="output tokens per report part")
+    args = parser.parse_args()
+
+    ra = load_studio_module("module-4", "research_assistant")
+
+    memo = " ".join(f"insight{i}" for i in range(args.section_tokens))
+    state = {"topic": "LangGraph", "sections": [f"## Memo {i}\n{memo}" for i in range(args.sections)]}
+    print(f"{'mode':<14} {'calls':>5} {'prompt':>8} {'cacheable':>9} {'completion':>10} {'seconds':>8}")
+    for mode in ["separate", "shared_prefix", "combined"]:
+        # Every part has the same length whether it is written alone or as a field of the combined output
+        ra.llm = FakeChatModel(latency=args.latency, token_latency=args.token_latency,
+                               output_tokens=args.part_tokens, string_tokens=args.part_tokens)
+        start = time.perf_counter()
+        asyncio.run(write(ra, state, mode))
+        elapsed = time.perf_counter() - start
+
+        # Tokens a provider prompt cache could serve: the shared prefix, on every call after the first
+        cacheable = 0
+        if mode == "shared_prefix":
+            prefix = ra.writer_messages(state, {"configurable": {"writer_mode": mode}}, "report")[0].content
+            # The fake model counts whitespace-separated words as tokens
+            cacheable = 2 * len(prefix.split())
+        print(f"{mode:<14} {ra.llm.calls:>5} {ra.llm.prompt_tokens:>8} {cacheable:>9} {ra.llm.completion_tokens:>10} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compare the sync and async builds of the research assistant graph offline.
+
+    python benchmarks/research_assistant_async.py --analysts 8 --latency 0.2
+
+Every LLM and search call sleeps for `--latency` seconds. The sync graph runs the
+interviews on worker threads, the async graph runs them all on one event loop.
+"""
+import argparse
+import asyncio
+import time
+
+from fakes import FakeChatModel, FakeTavilySearch, FakeWikipediaLoader
+from studio import load_studio_module
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--analysts", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    ra = load_studio_module("module-4", "research_assistant")
+    import retrieval  # shared helper module imported by research_assistant
+    ra.llm = FakeChatModel(latency=args.latency, list_size=args.analysts)
+    retrieval.TavilySearchResults = FakeTavilySearch
+    retrieval.WikipediaLoader = FakeWikipediaLoader
+    FakeTavilySearch.latency = FakeWikipediaLoader.latency = args.latency
+
+    # Compile without the human_feedback breakpoint so a run goes end to end
+    inputs = {"topic": "LangGraph", "max_analysts": args.analysts, "max_num_turns": args.turns}
+    sync_graph = ra.builder.compile()
+    async_graph = ra.async_builder.compile()
+
+    start = time.perf_counter()
+    result = sync_graph.invoke(inputs)
+    print(f"sync:  {time.perf_counter() - start:.2f}s, {len(result['sections'])} sections")
+
+    # Search results are cached; start the async run cold as well
+    ra.web_search.clear()
+    ra.wikipedia_search.clear()
+
+    start = time.perf_counter()
+    result = asyncio.run(async_graph.ainvoke(inputs))
+    print(f"async: {time.perf_counter() - start:.2f}s, {len(result['sections'])} sections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Benchmark every graph listed in the studio langgraph.json files, offline.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --graphs map_reduce research_assistant --llm-latency 0.2
+    python benchmarks/run.py --baseline results.json
+
+ChatOpenAI, Tavily and Wikipedia are replaced by the fakes in fakes.py before the
+studio modules are imported, so no API keys or network access are needed. For
+each graph the harness records:
+
+- per-node latency and superstep count of a single run (from the debug stream)
+- wall-clock time and peak Python memory of that run
+- throughput of `--concurrency` runs started together
+
+Results go to a JSON file that `--baseline` compares a later run against. With
+`--instrument DIR` one extra run per graph is traced with module-4/studio/instrumentation.py
+and its spans (spans.jsonl) and Prometheus metrics (<graph>.prom) are written to DIR.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from statistics import mean
+
+import langchain_community.document_loaders
+import langchain_community.tools.tavily_search
+import langchain_openai
+from langchain_core.messages import HumanMessage
+
+from fakes import FakeChatModel, FakeTavilySearch, FakeWikipediaLoader
+from studio import ROOT, load_studio_module
+
+# Inputs for one run of each graph
+SCENARIOS = {
+    "simple_graph": {"graph_state": "Hi, this is Lance."},
+    "router": {"messages": [HumanMessage(content="Multiply 2 and 3")]},
+    "agent": {"messages": [HumanMessage(content="Add 3 and 4. Multiply the output by 2. Divide the output by 5")]},
+    # Long enough to go over the chatbot's memory budget and trigger a summary
+    "chatbot": {"messages": [HumanMessage(content=f"Message {i} " + "lorem ipsum " * 200) for i in range(7)]},
+    "dynamic_breakpoints": {"input": "hi"},
+    "parallelization": {"question": "How were Nvidia's Q2 2024 earnings"},
+    "sub_graphs": {"raw_logs": [
+        {"id": "1", "question": "How can I import ChatOllama?", "answer": "from langchain_community.chat_models import ChatOllama"},
+        {"id": "2", "question": "How can I use Chroma vector store?", "answer": "Use the Chroma class", "grade": 0, "grader": "Document Relevance Recall", "feedback": "Irrelevant"},
+    ]},
+    "map_reduce": {"topic": "animals"},
+    "research_assistant": {"topic": "LangGraph", "max_analysts": 3},
+    "research_assistant_async": {"topic": "LangGraph", "max_analysts": 3},
+}
+
+
+def install_fakes(args):
+    """ Swap the network clients for fakes before any studio module is imported """
+
+    def fake_chat_openai(**kwargs):
+        return FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency,
+                             output_tokens=args.output_tokens, list_size=3)
+
+    langchain_openai.ChatOpenAI = fake_chat_openai
+    langchain_community.tools.tavily_search.TavilySearchResults = FakeTavilySearch
+    langchain_community.document_loaders.WikipediaLoader = FakeWikipediaLoader
+    FakeTavilySearch.latency = FakeWikipediaLoader.latency = args.search_latency
+
+
+def discover():
+    """ (module, graph name, file stem, attribute) for every langgraph.json entry """
+    for config_path in sorted(ROOT.glob("module-*/studio/langgraph.json")):
+        module = config_path.parent.parent.name
+        for name, target in json.loads(config_path.read_text())["graphs"].items():
+            path, attribute = target.split(":")
+            yield module, name, path.removeprefix("./").removesuffix(".py"), attribute
+
+
+def reset_caches():
+    """ Start every run cold: clear response and search caches shared through sys.modules """
+    for module_name in ("llm_cache", "retrieval"):
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        for value in vars(module).values():
+            if not isinstance(value, type) and hasattr(value, "clear") and hasattr(value, "stats"):
+                value.clear()
+
+
+def load_graph(module: str, stem: str, attribute: str):
+    """ The graph behind a langgraph.json entry, resolving lazy graph factories to their module """
+    entry = getattr(load_studio_module(module, stem), attribute)
+    target = getattr(entry, "target", None)
+    if target is not None:
+        # Loaded as a fresh module: a factory's plain-name import would share "agent" across modules
+        return getattr(load_studio_module(module, target[0]), target[1])
+    return entry
+
+
+def runnable_graph(graph):
+    """ Recompile graphs that stop at a breakpoint so a benchmark run goes end to end """
+    if getattr(graph, "interrupt_before_nodes", None) or getattr(graph, "interrupt_after_nodes", None):
+        return graph.builder.compile()
+    return graph
+
+
+async def profile_run(graph, inputs) -> dict:
+    """ One run on the debug stream: per-node latency and superstep count """
+    started, durations, steps = {}, defaultdict(list), 0
+    async for namespace, event in graph.astream(inputs, stream_mode="debug", subgraphs=True):
+        if event["type"] not in ("task", "task_result"):
+            continue
+        # Nodes inside sub-graphs are reported as parent/child
+        path = "/".join([part.split(":")[0] for part in namespace] + [event["payload"]["name"]])
+        task_id = event["payload"]["id"]
+        timestamp = datetime.fromisoformat(event["timestamp"]).timestamp()
+        if not namespace:
+            steps = max(steps, event["step"])
+        if event["type"] == "task":
+            started[task_id] = timestamp
+        elif task_id in started:
+            durations[path].append(timestamp - started.pop(task_id))
+    return {
+        "supersteps": steps,
+        "nodes": {
+            path: {"calls": len(values), "mean_s": mean(values), "max_s": max(values)}
+            for path, values in sorted(durations.items())
+        },
+    }
+
+
+async def traced_run(graph, inputs, name: str, directory: str) -> list:
+    """ One instrumented run; returns LLM time per node, largest first """
+    instrumentation = load_studio_module("module-4", "instrumentation")
+    exporter = instrumentation.JsonlSpanExporter(os.path.join(directory, "spans.jsonl"))
+    traced, recorder = instrumentation.instrument(graph, instrumentation.Instrumentation(name, [exporter]))
+    reset_caches()
+    await traced.ainvoke(inputs)
+    recorder.write_prometheus(os.path.join(directory, f"{name}.prom"))
+    return recorder.llm_summary()
+
+
+async def benchmark(graph, inputs, concurrency: int) -> dict:
+    reset_caches()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await profile_run(graph, inputs)
+    result["wall_s"] = time.perf_counter() - start
+    result["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    reset_caches()
+    start = time.perf_counter()
+    await asyncio.gather(*[graph.ainvoke(inputs) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    result["concurrency"] = concurrency
+    result["throughput_runs_per_s"] = concurrency / elapsed
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """ Print wall-clock and throughput changes against a previous results file """
+    print(f"\n{'graph':<40} {'wall':>10} {'throughput':>12}")
+    for key, current in results["graphs"].items():
+        previous = baseline["graphs"].get(key)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        wall = current["wall_s"] / previous["wall_s"] - 1
+        throughput = current["throughput_runs_per_s"] / previous["throughput_runs_per_s"] - 1
+        flag = "  REGRESSION" if wall > threshold or throughput < -threshold else ""
+        print(f"{key:<40} {wall:>+9.0%} {throughput:>+11.0%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graphs", nargs="*", help="graph names to run (default: all)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=50)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change reported as a regression")
+    parser.add_argument("--instrument", metavar="DIR", help="also write spans and Prometheus metrics of one run per graph")
+    args = parser.parse_args()
+    if args.instrument:
+        os.makedirs(args.instrument, exist_ok=True)
+
+    install_fakes(args)
+    results = {"settings": vars(args), "graphs": {}}
+    for module, name, stem, attribute in discover():
+        if args.graphs and name not in args.graphs:
+            continue
+        key = f"{module}/{name}"
+        try:
+            graph = runnable_graph(load_graph(module, stem, attribute))
+            results["graphs"][key] = asyncio.run(benchmark(graph, SCENARIOS[name], args.concurrency))
+            if args.instrument:
+                results["graphs"][key]["llm"] = asyncio.run(traced_run(graph, SCENARIOS[name], name, args.instrument))
+        except Exception as error:
+            # Keep going: one broken graph should not hide the others' numbers
+            results["graphs"][key] = {"error": f"{type(error).__name__}: {error}"}
+
+        result = results["graphs"][key]
+        if "error" in result:
+            print(f"{key:<40} ERROR {result['error'][:80]}")
+        else:
+            print(f"{key:<40} {result['wall_s']:>7.3f}s {result['supersteps']:>3} steps "
+                  f"{result['throughput_runs_per_s']:>8.1f} runs/s {result['peak_memory_kb']:>9.0f} KiB peak")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Checkpoints per second of the stock SqliteSaver and TunedSqliteSaver under concurrent threads.
+
+    python benchmarks/sqlite_throughput.py --threads 1 8 64 --turns 20
+
+Every thread runs the module-2 chatbot (with an instant fake model) for `--turns`
+turns on its own conversation thread, all against one database file. The stock
+saver gets the connection the external-memory notebook uses. Reports checkpoints
+written per second, database size, and for the tuned saver the average number of
+writes committed per transaction.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+import langchain_openai
+from fakes import FakeChatModel
+from studio import load_studio_module
+
+
+def run(chatbot, saver, threads: int, turns: int, words: int) -> float:
+    graph = chatbot.workflow.compile(checkpointer=saver)
+
+    def conversation(thread: int):
+        config = {"configurable": {"thread_id": f"thread-{thread}", "summarization": "inline"}}
+        for turn in range(turns):
+            graph.invoke({"messages": [HumanMessage(content=f"Turn {turn} " + "some words " * words)]}, config)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(conversation, range(threads)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--words", type=int, default=200, help="size of each user message")
+    args = parser.parse_args()
+
+    langchain_openai.ChatOpenAI = lambda **kwargs: FakeChatModel(output_tokens=100)
+    chatbot = load_studio_module("module-2", "chatbot")
+    tuned = load_studio_module("module-2", "sqlite_checkpointer")
+
+    print(f"{'saver':<6} {'threads':>7} {'checkpoints':>11} {'per second':>10} {'db MiB':>7} {'writes/commit':>13}")
+    for threads in args.threads:
+        for name in ("stock", "tuned"):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "example.db")
+                if name == "stock":
+                    saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+                else:
+                    saver = tuned.TunedSqliteSaver(path)
+                elapsed = run(chatbot, saver, threads, args.turns, args.words)
+                checkpoints = saver.conn.execute("SELECT count(*) FROM checkpoints").fetchone()[0]
+                per_commit = f"{saver.batched_writes / saver.commits:.1f}" if name == "tuned" else "1.0"
+                if name == "tuned":
+                    saver.close()
+                else:
+                    saver.conn.close()
+                size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 2**20
+            print(f"{name:<6} {threads:>7} {checkpoints:>11} {checkpoints / elapsed:>10.0f} {size:>7.1f} {per_commit:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-call overhead of structured output: with_structured_output in the node vs the registry.
+
+    python benchmarks/structured_overhead.py --calls 500
+
+Calls a real ChatOpenAI whose HTTP client answers locally (httpx.MockTransport), so the
+numbers are the client-side cost of one structured call: building the runnable, the
+request payload, the SDK's parse and validation. For each schema used by the module-4
+nodes it times:
+  rebuilt   llm.with_structured_output(Schema).invoke(...), as the nodes did
+  reused    one with_structured_output runnable built up front
+  registry  structured_output(llm, Schema), the precompiled runnable
+and checks that all three send the same request and return the same object.
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+import langchain_openai
+from fakes import FakeChatModel, _fake_value
+
+RealChatOpenAI = langchain_openai.ChatOpenAI
+
+
+def completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-local", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+    }
+
+
+def local_model(replies: dict, requests: list):
+    """ ChatOpenAI answering every request locally with the canned reply for its schema """
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(200, json=completion(replies[body["response_format"]["json_schema"]["name"]]))
+
+    return RealChatOpenAI(model="gpt-4o", temperature=0, api_key="local",
+                          http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+
+
+def timed(fn, calls: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    # The studio modules are only loaded for their schemas
+    langchain_openai.ChatOpenAI = lambda **kwargs: FakeChatModel()
+    from studio import load_studio_module
+    map_reduce = load_studio_module("module-4", "map_reduce")
+    research_assistant = load_studio_module("module-4", "research_assistant")
+    from structured import structured_output
+
+    schemas = [map_reduce.Subjects, map_reduce.Joke, map_reduce.BestJoke,
+               research_assistant.Perspectives, research_assistant.SearchQuery]
+    replies = {}
+    for schema in schemas:
+        json_schema = schema.model_json_schema()
+        replies[schema.__name__] = json.dumps(_fake_value(json_schema, json_schema.get("$defs", {}), schema.__name__, 3))
+    requests = []
+    llm = local_model(replies, requests)
+    prompt = "Generate the set of analysts."
+
+    print(f"{'schema':<14} {'rebuilt us':>10} {'reused us':>10} {'registry us':>11} {'saved us':>9}")
+    for schema in schemas:
+        reused = llm.with_structured_output(schema)
+        registry = structured_output(llm, schema)
+
+        del requests[:]
+        results = [llm.with_structured_output(schema).invoke(prompt), reused.invoke(prompt), registry.invoke(prompt)]
+        assert results[0] == results[1] == results[2], schema.__name__
+        assert requests[0] == requests[1] == requests[2], schema.__name__
+
+        rebuilt_us = timed(lambda: llm.with_structured_output(schema).invoke(prompt), args.calls)
+        reused_us = timed(lambda: reused.invoke(prompt), args.calls)
+        registry_us = timed(lambda: registry.invoke(prompt), args.calls)
+        print(f"{schema.__name__:<14} {rebuilt_us:>10.0f} {reused_us:>10.0f} {registry_us:>11.0f} {rebuilt_us - registry_us:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Helpers to import the studio modules outside of LangGraph Studio."""
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The studio modules build their clients at import time; the benchmarks swap them for fakes
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+
+
+def load_studio_module(module: str, name: str):
+    """ Import `<module>/studio/<name>.py` as a fresh module """
+
+    studio_dir = ROOT / module / "studio"
+    if str(studio_dir) not in sys.path:
+        sys.path.insert(0, str(studio_dir))
+    spec = importlib.util.spec_from_file_location(f"{module.replace('-', '_')}_{name}", studio_dir / f"{name}.py")
+    mod = importlib.util.module_from_spec(spec)
+    # Registered so checkpoints can import the module's state classes by name
+    sys.modules[spec.name] = mod
+    spec.loader.exec_module(mod)
+    return mod
@@ -0,0 +1,91 @@
+"""Summary continuity and summarizer cost of the chatbot's memory over a long conversation.
+
+    python benchmarks/summary_continuity.py --turns 50 200
+
+Runs `--turns` turns of the module-2 chatbot (inline and background summarization)
+with a fake model whose summaries list the messages they cover. After every turn it
+checks that each earlier message is covered exactly once, by a summary or by still
+being in the history: nothing is lost and nothing is summarized twice. It reports
+how many tokens the summarizer was sent per call, which should stay flat as the
+conversation grows.
+"""
+import argparse
+import re
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import langchain_openai
+from fakes import FakeChatModel
+
+# Questions are tagged [q N] and replies [a N]
+tag_pattern = re.compile(r"\[[qa] \d+\]")
+
+
+def tags_in(text: str) -> list:
+    return tag_pattern.findall(text)
+
+
+class Recorder:
+    """ Scripted replies: answers carry the turn's tag, summaries list the tags they were given """
+
+    def __init__(self):
+        self.summary_calls = []
+
+    def __call__(self, messages, kwargs) -> AIMessage:
+        last = str(messages[-1].content)
+        if "Summarize" in last or "Merge them" in last:
+            tokens = sum(len(str(m.content)) // 4 for m in messages)
+            self.summary_calls.append(tokens)
+            if "Merge them" in last:
+                covered = tags_in(last)
+            else:
+                # Only the messages, not the prior summary quoted in the instructions
+                covered = [tag for m in messages[:-1] for tag in tags_in(str(m.content))]
+            return AIMessage(content=" ".join(covered))
+        return AIMessage(content=tags_in(last)[-1].replace("q", "a") + " " + "words " * 40)
+
+
+def run(chatbot, mode: str, turns: int, budget: dict) -> Recorder:
+    recorder = Recorder()
+    chatbot.model.responder = recorder
+    graph = chatbot.workflow.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": mode, "summarization": mode, **budget}}
+    for turn in range(turns):
+        graph.invoke({"messages": [HumanMessage(content=f"[q {turn}] " + "question " * 60)]}, config)
+        if mode == "background":
+            # Give the worker a moment, as the user would between turns
+            time.sleep(0.01)
+        values = graph.get_state(config).values
+        covered = tags_in(values.get("summary", "")) + [tag for m in values["messages"] for tag in tags_in(str(m.content))]
+        expected = {f"[{kind} {t}]" for t in range(turn + 1) for kind in "qa"}
+        assert set(covered) == expected, f"turn {turn}: missing {expected - set(covered)}"
+        assert len(covered) == len(expected), f"turn {turn}: covered twice"
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--context-tokens", type=int, default=800)
+    parser.add_argument("--tail-tokens", type=int, default=300)
+    parser.add_argument("--fanout", type=int, default=3)
+    args = parser.parse_args()
+
+    fake = FakeChatModel()
+    langchain_openai.ChatOpenAI = lambda **kwargs: fake
+    from studio import load_studio_module
+    chatbot = load_studio_module("module-2", "chatbot")
+    budget = {"memory_context_tokens": args.context_tokens, "memory_tail_tokens": args.tail_tokens,
+              "memory_fanout": args.fanout}
+
+    print(f"{'mode':<11} {'turns':>5} {'summary calls':>13} {'mean tokens':>11} {'max tokens':>10}")
+    for mode in ("inline", "background"):
+        for turns in args.turns:
+            calls = run(chatbot, mode, turns, budget).summary_calls
+            print(f"{mode:<11} {turns:>5} {len(calls):>13} {sum(calls) / max(len(calls), 1):>11.0f} {max(calls, default=0):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Time travel on a long thread: scanning get_state_history vs the indexed history.
+
+    python benchmarks/time_travel.py --turns 50 200
+
+Runs `--turns` turns of the module-3 agent (five checkpoints per turn) on a checkpointer
+wrapped in IndexedSaver, then finds the checkpoint at a middle step, the last tool call
+and the checkpoint that added the first message: once by walking get_state_history as
+the notebooks do, once through the index. Both must find the same checkpoint; it then
+forks from the indexed entry.
+"""
+import argparse
+import time
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import langchain_openai
+from fakes import FakeChatModel
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def scan(graph, config, match, oldest: bool = False):
+    found = None
+    for state in graph.get_state_history(config):
+        if match(state):
+            found = state.config["configurable"]["checkpoint_id"]
+            if not oldest:
+                break
+    return found
+
+
+def run(agent, history, turns: int):
+    memory = history.IndexedSaver(MemorySaver())
+    graph = agent.builder.compile(checkpointer=memory)
+    config = {"configurable": {"thread_id": "1"}}
+    for turn in range(turns):
+        graph.invoke({"messages": [HumanMessage(content=f"Multiply {turn} and 3")]}, config)
+    first = graph.get_state(config).values["messages"][0]
+    step = memory.index.count(config) // 2
+
+    lookups = {
+        "at step": (
+            lambda: scan(graph, config, lambda s: s.metadata["step"] == step),
+            lambda: memory.index.at_step(config, step),
+        ),
+        "last tool call": (
+            lambda: scan(graph, config, lambda s: s.next == ("assistant",) and s.values["messages"][-1].type == "tool"),
+            lambda: memory.index.by_node(config, "tools", limit=1)[0],
+        ),
+        "added message": (
+            lambda: scan(graph, config, lambda s: any(m.id == first.id for m in s.values.get("messages", [])), oldest=True),
+            lambda: memory.index.by_message(config, first.id)[0],
+        ),
+    }
+    for name, (linear, indexed) in lookups.items():
+        found, linear_ms = timed(linear)
+        entry, indexed_ms = timed(indexed)
+        assert entry.config["configurable"]["checkpoint_id"] == found, name
+        print(f"{turns:>6} {name:<15} {linear_ms:>10.1f} {indexed_ms:>10.2f}")
+
+    entry = memory.index.at_step(config, step)
+    fork = graph.update_state(entry.config, {"messages": [HumanMessage(content="Multiply 7 and 6", id=first.id)]})
+    assert graph.get_state(fork).values["messages"][0].content == "Multiply 7 and 6"
+    assert memory.index.by_message(config, first.id)[-1].source == "update"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, nargs="+", default=[50, 200])
+    args = parser.parse_args()
+
+    fake = FakeChatModel()
+    langchain_openai.ChatOpenAI = lambda **kwargs: fake
+    from studio import load_studio_module
+    agent = load_studio_module("module-3", "agent")
+    import history
+
+    print(f"{'turns':>6} {'lookup':<15} {'linear ms':>10} {'index ms':>10}")
+    for turns in args.turns:
+        run(agent, history, turns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""LLM round trips and latency of the arithmetic agent, tool by tool vs with execute_plan.
+
+    python benchmarks/tool_rounds.py --llm-latency 0.3
+
+Replays scripted traces of the module-1 agent on a fake model. Each task is a list of
+tool calls where "$N" means the result of call N. In "react" mode the model makes every
+call whose inputs it already has, one round at a time (parallel tool calls included);
+in "plan" mode ({"tool_mode": "plan"}) it sends the whole task in one execute_plan call.
+Both modes must reach the same results. Reports LLM calls, prompt tokens and wall time.
+"""
+import argparse
+import json
+import re
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import langchain_openai
+from fakes import FakeChatModel
+
+TASKS = {
+    # Add 3 and 4. Multiply the output by 2. Divide the output by 5
+    "chain": [("add", {"a": 3, "b": 4}), ("multiply", {"a": "$0", "b": 2}), ("divide", {"a": "$1", "b": 5})],
+    "independent": [("add", {"a": 1, "b": 2}), ("multiply", {"a": 3, "b": 4}), ("divide", {"a": 10, "b": 5})],
+    # (1 + 2) * (3 + 4) / 7 + 10
+    "diamond": [("add", {"a": 1, "b": 2}), ("add", {"a": 3, "b": 4}), ("multiply", {"a": "$0", "b": "$1"}),
+                ("divide", {"a": "$2", "b": 7}), ("add", {"a": "$3", "b": 10})],
+}
+
+reference = re.compile(r"^\$(\d+)$")
+
+
+def refs(args: dict) -> set:
+    return {int(m.group(1)) for v in args.values() if isinstance(v, str) and (m := reference.match(v))}
+
+
+class ReactTrace:
+    """ Make every call whose inputs are known; answer once all calls are done """
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def __call__(self, messages, kwargs) -> AIMessage:
+        results = {int(m.tool_call_id.split("_")[1]): json.loads(m.content) for m in messages if isinstance(m, ToolMessage)}
+        asked = {int(call["id"].split("_")[1]) for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+        ready = [i for i, (_, args) in enumerate(self.steps) if i not in asked and refs(args) <= set(results)]
+        if not ready:
+            return AIMessage(content=f"The answer is {results[len(self.steps) - 1]}")
+        calls = []
+        for i in ready:
+            name, args = self.steps[i]
+            resolved = {k: results[int(v[1:])] if isinstance(v, str) and reference.match(v) else v for k, v in args.items()}
+            calls.append({"name": name, "args": resolved, "id": f"call_{i}"})
+        return AIMessage(content="", tool_calls=calls)
+
+
+class PlanTrace:
+    """ Send every call in one execute_plan call; answer with the last result """
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def __call__(self, messages, kwargs) -> AIMessage:
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content=f"The answer is {json.loads(messages[-1].content)[-1]['result']}")
+        steps = [{"tool": name, "args": args} for name, args in self.steps]
+        return AIMessage(content="", tool_calls=[{"name": "execute_plan", "args": {"steps": steps}, "id": "call_plan"}])
+
+
+def run(agent, fake, task: str, mode: str) -> dict:
+    steps = TASKS[task]
+    fake.responder = (PlanTrace if mode == "plan" else ReactTrace)(steps)
+    fake.calls = fake.prompt_tokens = 0
+    # Cached results would make the second mode look faster than it is
+    agent.tool_cache.clear()
+    graph = agent.builder.compile()
+    started = time.perf_counter()
+    result = graph.invoke({"messages": [HumanMessage(content=f"Task {task}")]}, {"configurable": {"tool_mode": mode}})
+    return {"llm_calls": fake.calls, "prompt_tokens": fake.prompt_tokens, "wall_s": time.perf_counter() - started,
+            "answer": result["messages"][-1].content}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    fake = FakeChatModel(latency=args.llm_latency)
+    langchain_openai.ChatOpenAI = lambda **kwargs: fake
+    from studio import load_studio_module
+    agent = load_studio_module("module-1", "agent")
+
+    print(f"{'task':<12} {'mode':<6} {'llm calls':>9} {'saved':>5} {'prompt tokens':>13} {'wall s':>7}")
+    for task in TASKS:
+        react = run(agent, fake, task, "react")
+        plan = run(agent, fake, task, "plan")
+        assert react["answer"] == plan["answer"], (task, react["answer"], plan["answer"])
+        for mode, result in (("react", react), ("plan", plan)):
+            saved = react["llm_calls"] - result["llm_calls"]
+            print(f"{task:<12} {mode:<6} {result['llm_calls']:>9} {saved:>5} {result['prompt_tokens']:>13} {result['wall_s']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Flat vs tournament reduce for map_reduce's best_joke, and merged memos for write_report.
+
+    python benchmarks/tournament.py --jokes 50 500 2000 --fan-in 10
+
+Runs best_joke from the module-4 map_reduce graph on N jokes, each carrying a score;
+the fake model picks the highest score it is shown, so every setting must select the
+same (globally best) joke. "flat" puts all jokes in one prompt, as before; "tournament"
+uses reduce_fan_in. Reports model calls, the largest prompt, and wall time with a fake
+whose latency grows with the prompt. It then checks that merge_memos and write_report
+on dozens of sections never send the writer more than fan_in memos.
+"""
+import argparse
+import random
+import re
+import time
+
+from langchain_core.messages import AIMessage
+
+import langchain_openai
+from fakes import FakeChatModel
+
+score_pattern = re.compile(r"score (\d+)")
+
+
+class Judge:
+    """ Pick the joke with the highest score; record the size of every prompt """
+
+    def __init__(self):
+        self.prompt_tokens = []
+        self.scores = []
+
+    def __call__(self, messages, kwargs) -> AIMessage:
+        text = "\n".join(str(m.content) for m in messages)
+        self.prompt_tokens.append(len(text.split()))
+        scores = [int(score) for score in score_pattern.findall(text)]
+        self.scores.append(scores)
+        if kwargs.get("tools"):
+            best = max(range(len(scores)), key=scores.__getitem__)
+            return AIMessage(content="", tool_calls=[{"name": "BestJoke", "args": {"id": best}, "id": "call_best"}])
+        # Merging memos: keep the content so the writer still sees it
+        return AIMessage(content=" ".join(f"memo score {score}" for score in scores))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jokes", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--fan-in", type=int, default=10)
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0002)
+    args = parser.parse_args()
+
+    fake = FakeChatModel(latency=args.latency, prompt_token_latency=args.prompt_token_latency)
+    langchain_openai.ChatOpenAI = lambda **kwargs: fake
+    from studio import load_studio_module
+    map_reduce = load_studio_module("module-4", "map_reduce")
+    research_assistant = load_studio_module("module-4", "research_assistant")
+    # Every run would otherwise be served from the response cache
+    map_reduce.model.cache = research_assistant.llm.cache = None
+
+    print(f"{'jokes':>6} {'mode':<11} {'calls':>5} {'max prompt':>10} {'wall s':>7}")
+    rng = random.Random(0)
+    for count in args.jokes:
+        scores = rng.sample(range(count * 10), count)
+        jokes = [f"Joke {i} with score {score}: why did the chicken cross the road? " + "ha " * 20 for i, score in enumerate(scores)]
+        expected = jokes[scores.index(max(scores))]
+        for mode, fan_in in (("flat", count), ("tournament", args.fan_in)):
+            judge = Judge()
+            fake.responder = judge
+            started = time.perf_counter()
+            result = map_reduce.best_joke({"topic": "chickens", "jokes": jokes}, {"configurable": {"reduce_fan_in": fan_in}})
+            wall = time.perf_counter() - started
+            assert result["best_selected_joke"] == expected, (mode, count)
+            print(f"{count:>6} {mode:<11} {len(judge.prompt_tokens):>5} {max(judge.prompt_tokens):>10} {wall:>7.2f}")
+
+    judge = Judge()
+    fake.responder = judge
+    sections = [f"## Memo {i}\nmemo score {i} " + "insight " * 50 for i in range(args.sections)]
+    state = {"topic": "LangGraph", "sections": sections}
+    config = {"configurable": {"reduce_fan_in": args.fan_in}}
+    state.update(research_assistant.merge_memos(state, config))
+    research_assistant.write_report(state, config)
+    # The writer's prompt (the last call) still covers every section
+    assert sorted(judge.scores[-1]) == list(range(args.sections))
+    print(f"\nmerge_memos + write_report on {args.sections} sections: {len(judge.prompt_tokens) - 1} merge calls, "
+          f"largest prompt {max(judge.prompt_tokens)} tokens (flat: {len(' '.join(sections).split())})")
+
+
+if __name__ == "__main__":
+    main()
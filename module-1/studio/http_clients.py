@@ -0,0 +1,279 @@
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Optional
+
+import httpx
+
+try:
+    import h2 # noqa: F401 -- HTTP/2 needs httpx[http2]
+    http2_available = True
+except ImportError:
+    http2_available = False
+
+try:
+    # The TCP keepalive profile ChatOpenAI puts on the clients it builds itself
+    from langchain_openai.chat_models._client_utils import _default_socket_options
+except ImportError:
+    _default_socket_options = None
+
+### Shared HTTP clients
+#
+# One pooled httpx.Client / httpx.AsyncClient pair per process, passed to every ChatOpenAI
+# (http_client=..., http_async_client=...) and used by the Tavily search wrapper, so all graphs
+# reuse the same keep-alive connections instead of opening (and TLS-handshaking) their own.
+# HTTP/2 is used when the h2 package is installed: one connection per host then carries
+# every concurrent request.
+#
+# Settings come from the environment (see build_http_clients); HTTP_MAX_PER_HOST caps the
+# requests in flight to one host, on top of httpx's process-wide connection limits.
+# http_clients.metrics() / render() report connections opened, TLS handshakes, requests and
+# pool utilization.
+#
+# The async pool is kept per event loop: httpx connections can't move between loops, and
+# the benchmarks and sync-to-async bridges run more than one.
+
+class HostSlots:
+    """ At most `limit` requests in flight per host; unlimited when limit is 0 """
+    def __init__(self, limit: int, make):
+        self.limit = limit
+        self.make = make
+        self.slots = {}
+
+    def get(self, request: httpx.Request):
+        if not self.limit:
+            return None
+        host = (request.url.scheme, request.url.host, request.url.port)
+        slot = self.slots.get(host)
+        if slot is None:
+            slot = self.slots.setdefault(host, self.make(self.limit))
+        return slot
+
+class ReleasingStream(httpx.SyncByteStream):
+    """ Response body that hands its host slot back when closed """
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+
+class AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release()
+
+class SharedTransport(httpx.BaseTransport):
+    """ Pooled transport with per-host limits and connection metrics """
+    def __init__(self, clients: "HTTPClients"):
+        self.clients = clients
+        self.lock = threading.Lock()
+        self.transport = None
+        self.hosts = HostSlots(clients.max_per_host, threading.BoundedSemaphore)
+
+    def pool(self) -> httpx.HTTPTransport:
+        # Built on first use: the SSL context costs more than the rest of the import
+        if self.transport is None:
+            with self.lock:
+                if self.transport is None:
+                    self.transport = httpx.HTTPTransport(**self.clients.transport_kwargs())
+        return self.transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self.pool()
+        with self.lock:
+            slot = self.hosts.get(request)
+        if slot is not None:
+            with self.clients.queued():
+                slot.acquire()
+        release = self.clients.started(slot)
+        try:
+            request.extensions["trace"] = self.clients.tracer(request.extensions.get("trace"))
+            response = pool.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=ReleasingStream(response.stream, release), extensions=response.extensions)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+class AsyncSharedTransport(httpx.AsyncBaseTransport):
+    """ SharedTransport for httpx.AsyncClient, with one pool per event loop """
+    def __init__(self, clients: "HTTPClients"):
+        self.clients = clients
+        self.lock = threading.Lock()
+        self.loops = weakref.WeakKeyDictionary() # loop -> (transport, HostSlots)
+
+    def pool(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            entry = self.loops.get(loop)
+            if entry is None:
+                entry = self.loops[loop] = (httpx.AsyncHTTPTransport(**self.clients.transport_kwargs()),
+                                            HostSlots(self.clients.max_per_host, asyncio.Semaphore))
+            return entry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport, hosts = self.pool()
+        slot = hosts.get(request)
+        if slot is not None:
+            with self.clients.queued():
+                await slot.acquire()
+        release = self.clients.started(slot)
+        try:
+            request.extensions["trace"] = self.clients.atracer(request.extensions.get("trace"))
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=AsyncReleasingStream(response.stream, release), extensions=response.extensions)
+
+    async def aclose(self):
+        # Only the current loop's pool can be closed from here
+        entry = self.loops.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+class HTTPClients:
+    """ Process-wide pooled httpx clients and their connection metrics """
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, keepalive_expiry: float = 30.0,
+                 max_per_host: int = 0, http2: Optional[bool] = None, timeout: float = 60.0):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.max_per_host = max_per_host
+        self.http2 = http2_available if http2 is None else http2 and http2_available
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "in_flight": 0, "queued": 0, "connections_opened": 0, "tls_handshakes": 0}
+        self.transport = SharedTransport(self)
+        self.async_transport = AsyncSharedTransport(self)
+        self.client = httpx.Client(transport=self.transport, timeout=timeout, follow_redirects=True)
+        self.async_client = httpx.AsyncClient(transport=self.async_transport, timeout=timeout, follow_redirects=True)
+
+    def transport_kwargs(self) -> dict:
+        kwargs = {"limits": self.limits, "http2": self.http2}
+        if _default_socket_options is not None:
+            kwargs["socket_options"] = list(_default_socket_options())
+        return kwargs
+
+    @contextmanager
+    def queued(self):
+        """ Count a request waiting for its host slot """
+        with self.lock:
+            self.counts["queued"] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.counts["queued"] -= 1
+
+    def started(self, slot):
+        """ Count a request going out; returns the callback for when its response is closed """
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts["in_flight"] += 1
+        released = []
+
+        def release():
+            if released:
+                return
+            released.append(True)
+            with self.lock:
+                self.counts["in_flight"] -= 1
+            if slot is not None:
+                slot.release()
+
+        return release
+
+    def event(self, name: str):
+        if name == "connection.connect_tcp.complete":
+            with self.lock:
+                self.counts["connections_opened"] += 1
+        elif name == "connection.start_tls.complete":
+            with self.lock:
+                self.counts["tls_handshakes"] += 1
+
+    def tracer(self, inner=None):
+        def trace(name, info):
+            self.event(name)
+            if inner is not None:
+                inner(name, info)
+        return trace
+
+    def atracer(self, inner=None):
+        async def trace(name, info):
+            self.event(name)
+            if inner is not None:
+                await inner(name, info)
+        return trace
+
+    def pool_stats(self) -> dict:
+        """ Open and busy connections across the sync pool and every loop's async pool """
+        pools = [self.transport.transport] + [transport for transport, _ in list(self.async_transport.loops.values())]
+        # httpx keeps its httpcore pool private; report nothing rather than fail if that changes
+        connections = [c for pool in pools for c in getattr(getattr(pool, "_pool", None), "connections", ())]
+        busy = sum(not c.is_idle() for c in connections)
+        return {"open": len(connections), "busy": busy, "idle": len(connections) - busy,
+                "utilization": busy / self.limits.max_connections if self.limits.max_connections else 0.0}
+
+    def metrics(self) -> dict:
+        with self.lock:
+            counts = dict(self.counts)
+        return {**counts, "http2": self.http2, "pool": self.pool_stats()}
+
+    def render(self, prefix: str = "langgraph_http") -> str:
+        """ Prometheus text exposition """
+        metrics = self.metrics()
+        lines = []
+        for name, kind, help, value in (
+            ("requests_total", "counter", "HTTP requests sent", metrics["requests"]),
+            ("connections_opened_total", "counter", "TCP connections opened", metrics["connections_opened"]),
+            ("tls_handshakes_total", "counter", "TLS handshakes", metrics["tls_handshakes"]),
+            ("requests_in_flight", "gauge", "Requests awaiting or reading a response", metrics["in_flight"]),
+            ("requests_queued", "gauge", "Requests waiting for a per-host slot", metrics["queued"]),
+            ("pool_connections", "gauge", "Open pooled connections", metrics["pool"]["open"]),
+            ("pool_busy_connections", "gauge", "Pooled connections serving a request", metrics["pool"]["busy"]),
+            ("pool_utilization", "gauge", "Busy connections over max connections", metrics["pool"]["utilization"]),
+        ):
+            lines += [f"# HELP {prefix}_{name} {help}", f"# TYPE {prefix}_{name} {kind}", f"{prefix}_{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.client.close()
+
+def build_http_clients() -> HTTPClients:
+    """ Settings from HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP_MAX_PER_HOST, HTTP2 and HTTP_TIMEOUT """
+
+    http2 = os.environ.get("HTTP2")
+    return HTTPClients(
+        max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive=int(os.environ.get("HTTP_MAX_KEEPALIVE", 20)),
+        keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30)),
+        max_per_host=int(os.environ.get("HTTP_MAX_PER_HOST", 0)),
+        http2=None if http2 is None else http2.lower() not in ("0", "false", "off"),
+        timeout=float(os.environ.get("HTTP_TIMEOUT", 60)),
+    )
+
+# One pair of clients per process, shared by every graph that imports it
+http_clients = build_http_clients()
@@ -3,6 +3,8 @@ from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 
+from http_clients import http_clients
+
 # Tool
 def multiply(a: int, b: int) -> int:
     """Multiplies a and b.
@@ -14,7 +16,7 @@ def multiply(a: int, b: int) -> int:
     return a * b
 
 # LLM with bound tool
-llm = ChatOpenAI(model="gpt-4o")
+llm = ChatOpenAI(model="gpt-4o", http_client=http_clients.client, http_async_client=http_clients.async_client)
 llm_with_tools = llm.bind_tools([multiply])
 
 # Node
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.runnables.config import ensure_config, get_executor_for_config
+from langchain_core.tools import BaseTool, StructuredTool, tool as as_tool
+from pydantic import BaseModel, Field
+
+from tool_execution import ToolExecution
+
+### Tool plans
+#
+# In the ReAct loop every tool round is another LLM call that resends the whole conversation,
+# even when the model already knows every call it will make ("add 3 and 4, multiply the
+# output by 2, divide the output by 5" is three rounds). execute_plan lets the model send
+# the whole chain at once: each step names a tool, and an argument "$N" stands for the
+# result of step N. The plan runs locally, in waves: steps whose inputs are ready run
+# side by side, and a step waits only for the steps it refers to. The model gets every
+# step's result back in one ToolMessage, so the chain costs one round trip instead of N.
+# Each step goes through the agent's ToolExecution, so it gets the same timeout, cache, error
+# handling and latency tracking as a call made directly, and runs in the run's context.
+
+reference = re.compile(r"^\$(\d+)$")
+
+class PlanStep(BaseModel):
+    tool: str = Field(description="Name of the tool to call")
+    args: Dict[str, Any] = Field(description='Tool arguments. Use "$N" as a value to pass the result of step N (0-based, earlier steps only).')
+
+class Plan(BaseModel):
+    steps: List[PlanStep] = Field(description="Tool calls in order")
+
+def dependencies(step: PlanStep, index: int) -> set:
+    found = set()
+    for value in step.args.values():
+        match = reference.match(value) if isinstance(value, str) else None
+        if match:
+            if int(match.group(1)) >= index:
+                raise ValueError(f"Step {index} refers to ${match.group(1)}; steps can only use results of earlier steps")
+            found.add(int(match.group(1)))
+    return found
+
+def waves(steps: List[PlanStep]) -> List[List[int]]:
+    """ Group step indexes so that each step comes after every step it depends on """
+    level = []
+    for index, step in enumerate(steps):
+        level.append(1 + max((level[dep] for dep in dependencies(step, index)), default=-1))
+    grouped = [[] for _ in range(max(level, default=-1) + 1)]
+    for index, depth in enumerate(level):
+        grouped[depth].append(index)
+    return grouped
+
+def step_result(message) -> Any:
+    """ A step's output for later steps: the tool's JSON value where there is one, else its text """
+    try:
+        return json.loads(message.content)
+    except (TypeError, ValueError):
+        return message.content
+
+class PlanRun:
+    """ State of one execute_plan call """
+
+    def __init__(self, steps: List[PlanStep], by_name: dict):
+        self.steps = [PlanStep.model_validate(step) for step in steps]
+        for step in self.steps:
+            if step.tool not in by_name:
+                raise ValueError(f"Unknown tool {step.tool!r}; use one of {sorted(by_name)}")
+        self.by_name = by_name
+        self.grouped = waves(self.steps)
+        self.results, self.errors = {}, {}
+
+    def call(self, index: int) -> Optional[dict]:
+        """ The tool call for a step, or None if a step it depends on failed """
+        step = self.steps[index]
+        failed = [dep for dep in dependencies(step, index) if dep in self.errors]
+        if failed:
+            self.errors[index] = f"skipped: step {failed[0]} failed"
+            return None
+        args = {}
+        for key, value in step.args.items():
+            match = reference.match(value) if isinstance(value, str) else None
+            args[key] = self.results[int(match.group(1))] if match else value
+        return {"name": step.tool, "args": args, "id": f"plan_step_{index}"}
+
+    def record(self, index: int, message):
+        if message.status == "error":
+            self.errors[index] = (message.artifact or {}).get("message") or message.content
+        else:
+            self.results[index] = step_result(message)
+
+    def report(self) -> tuple:
+        report = [
+            {"step": index, "tool": step.tool, **({"error": self.errors[index]} if index in self.errors else {"result": self.results[index]})}
+            for index, step in enumerate(self.steps)
+        ]
+        return json.dumps(report, default=str), {"steps": len(self.steps), "waves": len(self.grouped), "errors": len(self.errors)}
+
+def plan_tool(tools, execution: Optional[ToolExecution] = None) -> BaseTool:
+    """ The execute_plan tool over `tools` (functions or tools, as given to ToolNode), running steps through `execution` """
+    by_name = {}
+    for tool in tools:
+        tool = tool if isinstance(tool, BaseTool) else as_tool(tool)
+        by_name[tool.name] = tool
+    execution = execution or ToolExecution()
+
+    def execute_plan(steps: List[PlanStep]) -> tuple:
+        # The execute_plan run's own config, so the steps' callbacks nest under it
+        config = ensure_config()
+        plan = PlanRun(steps, by_name)
+
+        def run(index: int):
+            call = plan.call(index)
+            if call is not None:
+                plan.record(index, execution.call(by_name[call["name"]], call, config))
+
+        # Copies the context into each thread and honours max_concurrency
+        with get_executor_for_config(config) as executor:
+            for wave in plan.grouped:
+                list(executor.map(run, wave))
+        return plan.report()
+
+    async def aexecute_plan(steps: List[PlanStep]) -> tuple:
+        config = ensure_config()
+        plan = PlanRun(steps, by_name)
+
+        async def run(index: int):
+            call = plan.call(index)
+            if call is not None:
+                plan.record(index, await execution.acall(by_name[call["name"]], call, config))
+
+        for wave in plan.grouped:
+            await asyncio.gather(*(run(index) for index in wave))
+        return plan.report()
+
+    return StructuredTool.from_function(
+        execute_plan,
+        coroutine=aexecute_plan,
+        name="execute_plan",
+        description=(
+            "Run several tool calls in one go. Use it when you already know the whole chain of calls, "
+            'passing "$N" as an argument to use the result of step N. Returns the result (or error) of every step.'
+        ),
+        args_schema=Plan,
+        response_format="content_and_artifact",
+    )
@@ -1,75 +1,202 @@
-from langchain_core.messages import HumanMessage, SystemMessage, RemoveMessage
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.messages import SystemMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, START, END
 
 # We will use this model for both the conversation and the summarization
 from langchain_openai import ChatOpenAI
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+from http_clients import http_clients
+from llm_cache import response_cache
+from memory import add_to_tree, memory_budget, needs_summary, render_summary, report_prompt, split_tail, unsummarized
+model = ChatOpenAI(model="gpt-4o", temperature=0, cache=response_cache, http_client=http_clients.client, http_async_client=http_clients.async_client)
 
 # State class to store messages and summary
 class State(MessagesState):
     summary: str
-    
+    summary_tree: list # Levels of summaries, see memory.py; `summary` renders the whole tree
+    prompt_tokens: int # Size of the prompt sent on the last turn
+    summarized_through: str # Id of the last message folded into the summary tree
+    summary_pending: bool # A background summary was started for the thread and not folded in yet
+
+### Background summarization
+#
+# With `summarization: "background"` (opt in; runs need a thread_id), the reply is returned right
+# away and the summary is computed on a worker thread. The next turn on the thread folds the
+# finished summary (and the RemoveMessage deletions) into its own update, so it lands in a later
+# checkpoint without racing the run that is writing to the thread.
+# If the next turn arrives before the summary is ready, that turn simply uses the full history.
+#
+# Pending summaries live in this process only, at most max_pending of them for pending_ttl
+# seconds. When the state says a summary was started but none is pending here (another worker
+# ran the last turn, the process restarted, or the entry expired), the turn summarizes inline.
+#
+# Summarization starts once the history is above the memory_context_tokens budget, and keeps the
+# most recent messages that fit in memory_tail_tokens (see memory.py).
+
+summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarize")
+
+# thread_id -> pending summary, oldest first
+pending_summaries = OrderedDict()
+pending_lock = threading.Lock()
+max_pending = 1024
+pending_ttl = 3600
+
+class PendingSummary:
+    def __init__(self, future, summarized_ids, base_tree):
+        self.future = future
+        self.summarized_ids = summarized_ids # Messages the new summary replaces, oldest first
+        self.base_tree = base_tree # Summary tree the new one extends
+        self.created = time.monotonic()
+
+def summarization_mode(config: RunnableConfig) -> str:
+    configurable = config.get("configurable", {})
+    if "thread_id" not in configurable:
+        # Without a thread there is no next turn to hand the summary to
+        return "inline"
+    return configurable.get("summarization", "inline")
+
+def prune_pending():
+    """ Drop summaries whose thread hasn't come back within pending_ttl, then the oldest over max_pending (call with pending_lock held) """
+    expired = time.monotonic() - pending_ttl
+    while pending_summaries and (len(pending_summaries) > max_pending or next(iter(pending_summaries.values())).created < expired):
+        pending_summaries.popitem(last=False)
+
+def has_pending(thread_id: str) -> bool:
+    with pending_lock:
+        prune_pending()
+        return thread_id in pending_summaries
+
+def schedule_summary(thread_id: str, evicted: list, summarized_through: str, tree: list, fanout: int):
+    """ Start summarizing `evicted` into the tree on a worker thread, unless a summary is already pending
+
+    Only messages after the high-water mark are sent to the model; all of `evicted` are deleted.
+    """
+    with pending_lock:
+        if thread_id in pending_summaries:
+            return
+        new = unsummarized(evicted, summarized_through)
+        future = summary_executor.submit(add_to_tree, model, tree, new, fanout) if new else completed(tree)
+        pending_summaries[thread_id] = PendingSummary(future, [m.id for m in evicted], tree)
+        prune_pending()
+
+def completed(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+def take_summary(thread_id: str, messages: list, tree: list):
+    """ Return (new tree, deletions, high-water mark) if a summary for this thread is ready and still applies, else None """
+    with pending_lock:
+        pending = pending_summaries.get(thread_id)
+        if pending is None or not pending.future.done():
+            return None
+        del pending_summaries[thread_id]
+    try:
+        new_tree = pending.future.result()
+    except Exception:
+        # Summarization failed; it is retried after this turn
+        return None
+
+    # Drop the result if the thread changed underneath it: another summary was written, or
+    # messages it covers were removed (e.g. by an edit or time travel)
+    current_ids = {m.id for m in messages}
+    if pending.base_tree != tree or not set(pending.summarized_ids) <= current_ids:
+        return None
+    return new_tree, [RemoveMessage(id=id) for id in pending.summarized_ids], pending.summarized_ids[-1]
+
 # Define the logic to call the model
-def call_model(state: State):
-    
+def call_model(state: State, config: RunnableConfig):
+
     # Get summary if it exists
     summary = state.get("summary", "")
+    tree = state.get("summary_tree", [])
+    messages = state["messages"]
+    budget = memory_budget(config)
+    update = {}
+
+    # Fold in a summary finished in the background since the last turn
+    thread_id = config.get("configurable", {}).get("thread_id")
+    background = summarization_mode(config) == "background"
+    # Started on an earlier turn but not pending here: the summary is lost, should_continue summarizes inline
+    lost = background and state.get("summary_pending", False) and not has_pending(thread_id)
+    if background and (ready := take_summary(thread_id, messages, tree)):
+        tree, deletions, summarized_through = ready
+        summary = render_summary(tree)
+        removed = {m.id for m in deletions}
+        messages = [m for m in messages if m.id not in removed]
+        update = {"summary": summary, "summary_tree": tree, "messages": deletions, "summarized_through": summarized_through}
 
     # If there is summary, then we add it to messages
     if summary:
-        
+
         # Add summary to system message
         system_message = f"Summary of conversation earlier: {summary}"
 
         # Append summary to any newer messages
-        messages = [SystemMessage(content=system_message)] + state["messages"]
-    
+        prompt = [SystemMessage(content=system_message)] + messages
+
     else:
-        messages = state["messages"]
-    
-    response = model.invoke(messages)
-    return {"messages": response}
+        prompt = messages
+
+    prompt_tokens = report_prompt(prompt, budget)
+    response = model.invoke(prompt)
+
+    # Summarize off the critical path once the conversation is over budget
+    history = messages + [response]
+    if background and not lost and needs_summary(history, budget):
+        # The id lets the pending summary delete this message later
+        response.id = response.id or str(uuid.uuid4())
+        evicted, _ = split_tail(history, budget.tail_tokens)
+        if evicted:
+            schedule_summary(thread_id, evicted, state.get("summarized_through", ""), tree, budget.fanout)
+
+    if background:
+        update["summary_pending"] = has_pending(thread_id)
+    return {**update, "messages": update.get("messages", []) + [response], "prompt_tokens": prompt_tokens}
 
 # Determine whether to end or summarize the conversation
-def should_continue(state: State):
-    
+def should_continue(state: State, config: RunnableConfig):
+
     """Return the next node to execute."""
-    
+
     messages = state["messages"]
-    
-    # If there are more than six messages, then we summarize the conversation
-    if len(messages) > 6:
-        return "summarize_conversation"
-    
+
+    # If the history is over the token budget, then we summarize the conversation
+    # (in background mode this already started in call_model, unless no summary is pending here)
+    if needs_summary(messages, memory_budget(config)):
+        if summarization_mode(config) == "inline":
+            return "summarize_conversation"
+        if not has_pending(config["configurable"]["thread_id"]):
+            return "summarize_conversation"
+
     # Otherwise we can just end
     return END
 
-def summarize_conversation(state: State):
-    
-    # First get the summary if it exists
-    summary = state.get("summary", "")
+def summarize_conversation(state: State, config: RunnableConfig):
 
-    # Create our summarization prompt 
-    if summary:
-        
-        # If a summary already exists, add it to the prompt
-        summary_message = (
-            f"This is summary of the conversation to date: {summary}\n\n"
-            "Extend the summary by taking into account the new messages above:"
-        )
-        
-    else:
-        # If no summary exists, just create a new one
-        summary_message = "Create a summary of the conversation above:"
+    # Summarize everything but the recent messages that fit in the tail budget
+    budget = memory_budget(config)
+    evicted, _ = split_tail(state["messages"], budget.tail_tokens)
+    if not evicted:
+        # A single message over the budget: nothing older to summarize
+        return {}
+
+    # Only messages past the high-water mark are new to the summarizer
+    tree = state.get("summary_tree", [])
+    new = unsummarized(evicted, state.get("summarized_through", ""))
+    if new:
+        tree = add_to_tree(model, tree, new, budget.fanout)
 
-    # Add prompt to our history
-    messages = state["messages"] + [HumanMessage(content=summary_message)]
-    response = model.invoke(messages)
-    
-    # Delete all but the 2 most recent messages and add our summary to the state 
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
-    return {"summary": response.content, "messages": delete_messages}
+    # Delete the summarized messages and add our summary to the state
+    delete_messages = [RemoveMessage(id=m.id) for m in evicted]
+    return {"summary": render_summary(tree), "summary_tree": tree, "messages": delete_messages,
+            "summarized_through": evicted[-1].id, "summary_pending": False}
 
 # Define a new graph
 workflow = StateGraph(State)
@@ -82,4 +209,4 @@ workflow.add_conditional_edges("conversation", should_continue)
 workflow.add_edge("summarize_conversation", END)
 
 # Compile
-graph = workflow.compile()
\ No newline at end of file
+graph = workflow.compile()
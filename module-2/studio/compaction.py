@@ -0,0 +1,225 @@
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+### Checkpoint compaction
+#
+# Works on the tables written by SqliteSaver (and TunedSqliteSaver). For every thread and
+# checkpoint namespace it keeps:
+# - the last `keep_last` checkpoints, so recent time travel and resuming work as before
+# - keyframes: checkpoints whose metadata step is a multiple of `keyframe_every`, so older
+#   history stays browsable at a coarser grain (the step only grows along a thread, so the
+#   same checkpoints stay keyframes from one pass to the next)
+# Kept checkpoints whose parent is deleted are re-parented to their nearest kept ancestor,
+# so get_state_history still walks one connected chain. Writes left without a checkpoint
+# are deleted once the thread has saved a newer checkpoint or they are older than
+# `orphan_grace` seconds: a run that saves checkpoints in the background (durability="async")
+# can put its writes just before their checkpoint lands. Freed pages are returned to the
+# filesystem with incremental vacuum.
+#
+# Every change is made in short transactions of at most `batch_size` rows with a pause
+# in between, so live runs only ever wait for one small batch.
+#
+# SqliteSaver stores each checkpoint with all its channel values, so deleting ancestors loses
+# nothing the kept checkpoints need. Don't use it on a store wrapped in a delta-encoding saver.
+
+class CheckpointCompactor:
+    """ Retention and compaction for a SQLite checkpoint database
+
+    path: database file shared with the checkpointer
+    keep_last: most recent checkpoints kept per thread and namespace
+    keyframe_every: also keep checkpoints whose step is a multiple of this (0 to keep none)
+    batch_size: rows changed per transaction
+    vacuum_pages: pages released per incremental vacuum step
+    pause: seconds between transactions, leaving the write lock to live traffic
+    orphan_grace: seconds before writes without a checkpoint (and nothing newer) are deleted
+    """
+
+    def __init__(self, path: str, keep_last: int = 50, keyframe_every: int = 100, batch_size: int = 500,
+                 vacuum_pages: int = 256, pause: float = 0.01, orphan_grace: float = 300):
+        self.path = path
+        self.keep_last = keep_last
+        self.keyframe_every = keyframe_every
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.pause = pause
+        self.orphan_grace = orphan_grace
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.stop_event = threading.Event()
+        self.thread = None
+        # Totals since start
+        self.stats = defaultdict(int)
+
+    ## Planning
+
+    def threads_over_limit(self) -> list:
+        """ (thread_id, checkpoint_ns) pairs holding more than keep_last checkpoints """
+        return self.conn.execute(
+            "SELECT thread_id, checkpoint_ns FROM checkpoints GROUP BY thread_id, checkpoint_ns HAVING count(*) > ?",
+            (self.keep_last,),
+        ).fetchall()
+
+    def plan(self, thread_id: str, checkpoint_ns: str):
+        """ Return (checkpoint ids to delete, {kept checkpoint id: new parent id}) for one thread """
+        rows = self.conn.execute(
+            "SELECT checkpoint_id, parent_checkpoint_id, json_extract(CAST(metadata AS TEXT), '$.step') "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        parents = {checkpoint_id: parent for checkpoint_id, parent, _ in rows}
+        kept = {checkpoint_id for checkpoint_id, _, _ in rows[:self.keep_last]}
+        if self.keyframe_every:
+            kept |= {checkpoint_id for checkpoint_id, _, step in rows if step is not None and step % self.keyframe_every == 0}
+        deleted = [checkpoint_id for checkpoint_id in parents if checkpoint_id not in kept]
+
+        reparent = {}
+        for checkpoint_id in kept:
+            parent = parents[checkpoint_id]
+            ancestor = parent
+            # Walk up past deleted checkpoints (or ones already gone) to the nearest kept one
+            while ancestor is not None and ancestor not in kept:
+                ancestor = parents.get(ancestor)
+            if ancestor != parent:
+                reparent[checkpoint_id] = ancestor
+        return deleted, reparent
+
+    ## Changes
+
+    def transaction(self, statements: list):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for sql, rows in statements:
+                cur.executemany(sql, rows)
+            cur.execute("COMMIT")
+        except Exception:
+            if self.conn.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        finally:
+            cur.close()
+        time.sleep(self.pause)
+
+    def batches(self, items: list):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def compact_thread(self, thread_id: str, checkpoint_ns: str = "") -> int:
+        """ Apply retention to one thread; returns the number of checkpoints deleted """
+        deleted, reparent = self.plan(thread_id, checkpoint_ns)
+        # Re-parent first, so the chain stays connected whenever a batch commits
+        for batch in self.batches(list(reparent.items())):
+            self.transaction([(
+                "UPDATE checkpoints SET parent_checkpoint_id = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(parent, thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, parent in batch],
+            )])
+        for batch in self.batches(deleted):
+            keys = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in batch]
+            self.transaction([
+                ("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys),
+                ("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", keys),
+            ])
+        self.stats["checkpoints_deleted"] += len(deleted)
+        self.stats["checkpoints_reparented"] += len(reparent)
+        return len(deleted)
+
+    def delete_orphaned_writes(self) -> int:
+        """ Delete writes whose checkpoint no longer exists, e.g. left by deleted threads or crashed runs """
+        total = 0
+        # Fixed for the pass, so a write that turns stale midway waits for the next one
+        cutoff = checkpoint_id_before(time.time() - self.orphan_grace)
+        while not self.stop_event.is_set():
+            rows = self.conn.execute(
+                "SELECT w.rowid FROM writes w LEFT JOIN checkpoints c ON c.thread_id = w.thread_id "
+                "AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id "
+                "WHERE c.checkpoint_id IS NULL AND (w.checkpoint_id < ? OR EXISTS ("
+                "SELECT 1 FROM checkpoints n WHERE n.thread_id = w.thread_id "
+                "AND n.checkpoint_ns = w.checkpoint_ns AND n.checkpoint_id > w.checkpoint_id)) LIMIT ?",
+                (cutoff, self.batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            self.transaction([("DELETE FROM writes WHERE rowid = ?", rows)])
+            total += len(rows)
+        self.stats["writes_deleted"] += total
+        return total
+
+    def vacuum(self) -> int:
+        """ Release free pages a few at a time; returns the number of pages released """
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Needs a one-off full VACUUM first, see enable_incremental_vacuum
+            return 0
+        released = 0
+        while not self.stop_event.is_set():
+            free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            self.conn.execute(f"PRAGMA incremental_vacuum({min(free, self.vacuum_pages)})").fetchall()
+            released += min(free, self.vacuum_pages)
+            time.sleep(self.pause)
+        # Fold the WAL back into the database without waiting on readers
+        self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        self.stats["pages_released"] += released
+        return released
+
+    def run_once(self) -> dict:
+        """ One full pass over every thread """
+        started = time.perf_counter()
+        deleted = 0
+        for thread_id, checkpoint_ns in self.threads_over_limit():
+            if self.stop_event.is_set():
+                break
+            deleted += self.compact_thread(thread_id, checkpoint_ns)
+        writes = self.delete_orphaned_writes()
+        pages = self.vacuum()
+        result = {"checkpoints_deleted": deleted, "writes_deleted": writes, "pages_released": pages,
+                  "seconds": time.perf_counter() - started}
+        logger.info("Compaction pass: %(checkpoints_deleted)d checkpoints, %(writes_deleted)d writes, "
+                    "%(pages_released)d pages in %(seconds).2fs", result)
+        return result
+
+    ## Background service
+
+    def start(self, interval: float = 300):
+        """ Run a pass every `interval` seconds on a daemon thread """
+        def loop():
+            while not self.stop_event.is_set():
+                try:
+                    self.run_once()
+                except sqlite3.Error:
+                    logger.exception("Compaction pass failed; retrying next interval")
+                self.stop_event.wait(interval)
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=loop, name="checkpoint-compactor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        self.conn.close()
+
+def checkpoint_id_before(timestamp: float) -> str:
+    """ Lowest checkpoint id (a uuid6, ordered by time as text) made at the given unix time """
+    ticks = int(timestamp * 1e7) + 0x01B21DD213814000 # 100ns intervals since 1582-10-15
+    return str(uuid.UUID(int=((ticks >> 12) & 0xFFFFFFFFFFFF) << 80 | 0x6 << 76 | (ticks & 0x0FFF) << 64))
+
+def enable_incremental_vacuum(path: str):
+    """ One-off migration of an existing database to auto_vacuum=INCREMENTAL (rewrites the file; run offline) """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+### Response caches
+#
+# Plugged into chat models through LangChain's cache hook: ChatOpenAI(..., cache=response_cache).
+# LangChain hands us the serialized messages (`prompt`) and a string describing the model, its
+# parameters and any bound tools or structured-output schema (`llm_string`); both go into the key.
+#
+# Off unless LLM_CACHE is set: a cached response is replayed verbatim, so sampled output
+# (temperature > 0) would repeat from run to run.
+
+class ResponseCache(BaseCache):
+    """ Base class: canonical keys and hit / miss counters """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def _count(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def fresh(generations: Sequence[Generation]) -> list:
+        """ Copies for one hit: callers may mutate the messages (e.g. set .name), and each gets a new id """
+        generations = [copy.deepcopy(generation) for generation in generations]
+        for generation in generations:
+            if isinstance(generation, ChatGeneration):
+                generation.message.id = None
+        return generations
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+class LRUResponseCache(ResponseCache):
+    """ In-memory cache holding at most `max_entries` responses, least recently used evicted first """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self.cache_key(prompt, llm_string)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        self._count(entry is not None)
+        return self.fresh(entry[1]) if entry is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self.cache_key(prompt, llm_string)
+        with self.lock:
+            self.entries[key] = (time.time(), [copy.deepcopy(generation) for generation in return_val])
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self, **kwargs) -> None:
+        with self.lock:
+            self.entries.clear()
+
+class SQLiteResponseCache(ResponseCache):
+    """ On-disk cache shared by every process pointing at the same file """
+
+    def __init__(self, path: str, max_entries: int = 10_000, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self.conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self.cache_key(prompt, llm_string)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                row = None
+            elif row is not None:
+                self.conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        self._count(row is not None)
+        if row is None:
+            return None
+        return self.fresh([ChatGeneration(message=message) for message in messages_from_dict(json.loads(row[0]))])
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        # Only chat generations are stored; they are all the studio graphs produce
+        if not all(isinstance(generation, ChatGeneration) for generation in return_val):
+            return
+        key = self.cache_key(prompt, llm_string)
+        value = json.dumps([message_to_dict(generation.message) for generation in return_val])
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)", (key, value, now, now))
+            # Size-based eviction: drop the least recently used rows over the limit
+            self.conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+    def clear(self, **kwargs) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM llm_cache")
+            self.conn.commit()
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """ Pick a backend from LLM_CACHE (memory, sqlite or off), LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES and LLM_CACHE_TTL """
+
+    backend = os.environ.get("LLM_CACHE", "off").lower()
+    ttl = os.environ.get("LLM_CACHE_TTL")
+    ttl = float(ttl) if ttl else None
+    max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 1024))
+    if backend == "sqlite":
+        return SQLiteResponseCache(os.environ.get("LLM_CACHE_PATH", "llm_cache.db"), max_entries, ttl)
+    if backend == "memory":
+        return LRUResponseCache(max_entries, ttl)
+    return None
+
+# One cache per process, shared by every graph that imports it
+response_cache = build_response_cache()
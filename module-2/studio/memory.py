@@ -0,0 +1,136 @@
+import logging
+from typing import List, NamedTuple, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+### Token counting
+
+encoder = None
+
+def count_tokens(text: str) -> int:
+    """ Count gpt-4o tokens with tiktoken, or estimate ~4 characters per token if the encoding can't be loaded """
+    global encoder
+    if encoder is None:
+        try:
+            import tiktoken
+            encoder = tiktoken.encoding_for_model("gpt-4o")
+        except Exception:
+            # tiktoken downloads its encodings on first use; stay usable offline
+            encoder = False
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def message_tokens(message: BaseMessage) -> int:
+    # Chat formatting adds a few tokens per message on top of the content
+    return count_tokens(str(message.content)) + 4
+
+def messages_tokens(messages: List[BaseMessage]) -> int:
+    return sum(message_tokens(m) for m in messages)
+
+### Budgets
+
+class MemoryBudget(NamedTuple):
+    context_tokens: int = 3000 # Summarize once the history is larger than this
+    tail_tokens: int = 1000 # Recent messages kept word for word after summarizing
+    fanout: int = 4 # Summaries a level holds before the oldest are compacted into the level above
+
+def memory_budget(config: RunnableConfig) -> MemoryBudget:
+    """ Budgets from the memory_context_tokens, memory_tail_tokens and memory_fanout configurable keys """
+    configurable = config.get("configurable", {})
+    default = MemoryBudget()
+    return MemoryBudget(
+        int(configurable.get("memory_context_tokens", default.context_tokens)),
+        int(configurable.get("memory_tail_tokens", default.tail_tokens)),
+        max(2, int(configurable.get("memory_fanout", default.fanout))),
+    )
+
+def needs_summary(messages: List[BaseMessage], budget: MemoryBudget) -> bool:
+    return messages_tokens(messages) > budget.context_tokens
+
+def split_tail(messages: List[BaseMessage], tail_tokens: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """ Split into (messages to summarize, recent messages that fit in `tail_tokens`)
+
+    The latest message is always kept, even when it is larger than the budget on its own.
+    """
+    used, start = 0, len(messages)
+    while start > 0:
+        cost = message_tokens(messages[start - 1])
+        if start < len(messages) and used + cost > tail_tokens:
+            break
+        used += cost
+        start -= 1
+    return messages[:start], messages[start:]
+
+### Summary tree
+#
+# Evicted messages are summarized once into a leaf summary (level 0). When a level holds more
+# than `fanout` summaries, the oldest `fanout` are merged into one summary on the level above.
+# Old history is therefore compacted summary-by-summary instead of being re-summarized from
+# scratch on every eviction. Higher levels cover older, longer stretches of the conversation.
+#
+# A high-water mark (the id of the last message folded into the tree) makes sure a message is
+# summarized once: only messages after it are sent, together with the latest summary for context.
+
+leaf_instructions = "Summarize the conversation above in a short paragraph. Keep names, facts, decisions and open questions."
+
+continue_instructions = """This is the summary of the conversation before the messages above: {summary}
+
+Summarize only the messages above in a short paragraph that continues from it. Keep names, facts, decisions and open questions."""
+
+merge_instructions = """Below are summaries of consecutive parts of a conversation, oldest first.
+
+{summaries}
+
+Merge them into one short paragraph. Keep names, facts, decisions and open questions."""
+
+def unsummarized(messages: List[BaseMessage], summarized_through: str) -> List[BaseMessage]:
+    """ Messages after the high-water mark; all of them if the mark is no longer in the list """
+    for i, message in enumerate(messages):
+        if message.id == summarized_through:
+            return messages[i + 1:]
+    return messages
+
+def latest_summary(tree: List[List[str]]) -> str:
+    """ The summary covering the most recent summarized messages """
+    for level in tree:
+        if level:
+            return level[-1]
+    return ""
+
+def summarize_messages(model, messages: List[BaseMessage], prior_summary: str = "") -> str:
+    instructions = continue_instructions.format(summary=prior_summary) if prior_summary else leaf_instructions
+    return model.invoke(messages + [HumanMessage(content=instructions)]).content
+
+def merge_summaries(model, summaries: List[str]) -> str:
+    summaries = "\n\n".join(f"Part {i + 1}: {summary}" for i, summary in enumerate(summaries))
+    return model.invoke([SystemMessage(content=merge_instructions.format(summaries=summaries))]).content
+
+def add_to_tree(model, tree: List[List[str]], evicted: List[BaseMessage], fanout: int) -> List[List[str]]:
+    """ Return a new tree with `evicted` summarized into level 0 and full levels compacted upwards """
+    tree = [list(level) for level in tree] or [[]]
+    tree[0].append(summarize_messages(model, evicted, latest_summary(tree)))
+    level = 0
+    while len(tree[level]) > fanout:
+        merged = merge_summaries(model, tree[level][:fanout])
+        tree[level] = tree[level][fanout:]
+        if level + 1 == len(tree):
+            tree.append([])
+        tree[level + 1].append(merged)
+        level += 1
+    return tree
+
+def render_summary(tree: List[List[str]]) -> str:
+    """ The whole tree as one summary, oldest (highest level) first """
+    return "\n\n".join(summary for level in reversed(tree) for summary in level)
+
+### Reporting
+
+def report_prompt(messages: List[BaseMessage], budget: MemoryBudget) -> int:
+    """ Log and return the size of the prompt sent this turn """
+    tokens = messages_tokens(messages)
+    logger.info("Prompt is %d tokens (%d messages, summarize above %d)", tokens, len(messages), budget.context_tokens)
+    return tokens
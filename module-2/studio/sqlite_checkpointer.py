@@ -0,0 +1,306 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from langgraph.checkpoint.base import WRITES_IDX_MAP, CheckpointTuple, get_checkpoint_metadata
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.utils import load_pending_writes, pending_writes_sql, search_where
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+### Compression
+
+class CompressingSerializer:
+    """ Compress serialized values larger than `threshold` bytes with zstd (zlib if zstandard isn't installed)
+
+    The codec is recorded in the type tag, so existing uncompressed blobs still load.
+    """
+
+    def __init__(self, serde=None, threshold: int = 1024, level: int = 3):
+        self.serde = serde or JsonPlusSerializer()
+        self.threshold = threshold
+        self.level = level
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        # zstd contexts are not thread-safe; keep one pair per thread
+        self.local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            if not hasattr(self.local, "compressor"):
+                self.local.compressor = zstandard.ZstdCompressor(level=self.level)
+            return self.local.compressor.compress(data)
+        return zlib.compress(data, self.level)
+
+    def decompress(self, codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Checkpoint was compressed with zstd; install zstandard to read it")
+            if not hasattr(self.local, "decompressor"):
+                self.local.decompressor = zstandard.ZstdDecompressor()
+            return self.local.decompressor.decompress(data)
+        return zlib.decompress(data)
+
+    def dumps_typed(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.threshold:
+            compressed = self.compress(data)
+            if len(compressed) < len(data):
+                return f"{type_}+{self.codec}", compressed
+        return type_, data
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.endswith(("+zstd", "+zlib")):
+            type_, codec = type_.rsplit("+", 1)
+            payload = self.decompress(codec, payload)
+        return self.serde.loads_typed((type_, payload))
+
+### Connections
+
+def connect(path: str, read_only: bool = False) -> sqlite3.Connection:
+    # Statements are compiled once per connection and reused from the statement cache
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256, isolation_level=None)
+    if not read_only:
+        # Only takes effect on a new database (so it must come first); lets compaction.py give freed pages back
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL") # fsync at checkpoints of the WAL, not every commit
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-16384") # 16 MiB page cache
+    conn.execute("PRAGMA mmap_size=268435456")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+### Checkpointer
+
+insert_checkpoint = "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)"
+replace_writes = "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+ignore_writes = "INSERT OR IGNORE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+# TunedSqliteSaver relies on SqliteSaver internals that aren't public API: its `lock` and
+# `_has_task_path` attributes, cursor() as the path every read takes, and the query helpers in
+# langgraph.checkpoint.sqlite.utils. requirements.txt pins langgraph-checkpoint-sqlite to the
+# minor version this was written against; check them again before raising the pin.
+sqlite_saver_internals = ("lock", "_has_task_path", "cursor")
+
+class TunedSqliteSaver(SqliteSaver):
+    """ SqliteSaver tuned for many concurrent threads on one database file
+
+    - WAL journal, relaxed fsync, larger page cache and memory-mapped reads
+    - One writer connection fed by a queue: every write waiting when a transaction starts is
+      committed with it, so the writes of a superstep (and of concurrent runs) share one commit
+    - A pool of `readers` read-only connections, so reads never wait for the writer
+    - Blobs over `compress_threshold` bytes compressed with zstd (zlib without zstandard)
+
+    Writes return once committed, so a read that follows a write always sees it.
+    Needs a database file: ":memory:" would give every reader its own empty database.
+
+        with TunedSqliteSaver.from_path("state_db/example.db") as memory:
+            graph = workflow.compile(checkpointer=memory)
+    """
+
+    def __init__(self, path: str, readers: int = 4, max_batch: int = 256, compress_threshold: int = 1024, serde=None):
+        if path == ":memory:" or path.startswith("file::memory:") or "mode=memory" in path:
+            raise ValueError("TunedSqliteSaver needs a database file; use SqliteSaver for an in-memory database")
+        super().__init__(connect(path), serde=CompressingSerializer(serde, compress_threshold))
+        missing = [name for name in sqlite_saver_internals if not hasattr(self, name)]
+        if missing:
+            raise RuntimeError(f"This langgraph-checkpoint-sqlite no longer has SqliteSaver.{', '.join(missing)}; "
+                               "see the pin in requirements.txt")
+        self.path = path
+        self.max_batch = max_batch
+        with self.lock:
+            self.setup()
+        self.readers = queue.Queue()
+        for _ in range(readers):
+            self.readers.put(connect(path, read_only=True))
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, name="sqlite-checkpoint-writer", daemon=True)
+        self.writer.start()
+        # Metrics
+        self.commits = 0
+        self.batched_writes = 0
+
+    @classmethod
+    @contextmanager
+    def from_path(cls, path: str, **kwargs):
+        saver = cls(path, **kwargs)
+        try:
+            yield saver
+        finally:
+            saver.close()
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+        while not self.readers.empty():
+            self.readers.get().close()
+        self.conn.close()
+
+    ## Writes
+
+    def submit(self, statements: list):
+        """ Queue (sql, rows) statements for the writer and wait until they are committed """
+        future = Future()
+        self.pending.put((statements, future))
+        return future.result()
+
+    def write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.pending.put(None)
+                    break
+                batch.append(item)
+            self.commit(batch)
+
+    def commit(self, batch: list):
+        try:
+            self.execute(batch)
+        except Exception as error:
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+                return
+            # Retry one by one so a bad write only fails its own caller
+            for item in batch:
+                try:
+                    self.execute([item])
+                except Exception as error:
+                    item[1].set_exception(error)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def execute(self, batch: list):
+        with self.lock:
+            cur = self.conn.cursor()
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                for statements, _ in batch:
+                    for sql, rows in statements:
+                        cur.executemany(sql, rows)
+                cur.execute("COMMIT")
+            except Exception:
+                if self.conn.in_transaction:
+                    cur.execute("ROLLBACK")
+                raise
+            finally:
+                cur.close()
+            self.commits += 1
+            self.batched_writes += len(batch)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False).encode("utf-8", "ignore")
+        self.submit([(insert_checkpoint, [(
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            type_, serialized_checkpoint, serialized_metadata,
+        )])])
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        query = replace_writes if all(w[0] in WRITES_IDX_MAP for w in writes) else ignore_writes
+        rows = [
+            (
+                str(config["configurable"]["thread_id"]),
+                str(config["configurable"]["checkpoint_ns"]),
+                str(config["configurable"]["checkpoint_id"]),
+                task_id,
+                task_path,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        self.submit([(query, rows)])
+
+    def delete_thread(self, thread_id):
+        self.submit([
+            ("DELETE FROM checkpoints WHERE thread_id = ?", [(str(thread_id),)]),
+            ("DELETE FROM writes WHERE thread_id = ?", [(str(thread_id),)]),
+        ])
+
+    ## Reads
+
+    @contextmanager
+    def reader(self):
+        conn = self.readers.get()
+        try:
+            yield conn
+        finally:
+            self.readers.put(conn)
+
+    @contextmanager
+    def cursor(self, transaction: bool = True):
+        # SqliteSaver reads through cursor(); writes never do here, they go through the writer
+        with self.reader() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        where, params = search_where(config, filter, before)
+        query = f"SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (*params, limit)
+        # Read the page up front so the reader goes back to the pool between items
+        with self.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata in rows:
+            with self.cursor() as cur:
+                cur.execute(pending_writes_sql(self._has_task_path), (thread_id, checkpoint_ns, checkpoint_id))
+                pending_writes = load_pending_writes(cur, self.serde)
+            yield CheckpointTuple(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+                self.serde.loads_typed((type_, checkpoint)),
+                json.loads(metadata) if metadata is not None else {},
+                (
+                    {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                    if parent_checkpoint_id
+                    else None
+                ),
+                pending_writes,
+            )
+
+    ## Async, on the default executor
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
@@ -1,8 +1,13 @@
 from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 
 from langgraph.graph import START, StateGraph, MessagesState
-from langgraph.prebuilt import tools_condition, ToolNode
+from langgraph.prebuilt import tools_condition
+
+from http_clients import http_clients
+from tool_execution import ToolCache, ToolExecution
+from tool_plan import plan_tool
 
 def add(a: int, b: int) -> int:
     """Adds a and b.
@@ -33,21 +38,36 @@ def divide(a: int, b: int) -> float:
 
 tools = [add, multiply, divide]
 
+# The arithmetic tools are pure, so repeated calls (across turns and threads) are served from a cache
+tool_cache = ToolCache(maxsize=1024)
+tool_cache.pure(add, multiply, divide)
+
+# Tool calls from one message run concurrently; each gets at most 10s and errors come back as ToolMessages
+tool_execution = ToolExecution(timeout=10, cache=tool_cache)
+
+# With {"configurable": {"tool_mode": "plan"}} the model can also send a whole chain of calls
+# at once with execute_plan, which runs it locally and saves a round trip per step
+execute_plan = plan_tool(tools, tool_execution)
+
 # Define LLM with bound tools
-llm = ChatOpenAI(model="gpt-4o")
+llm = ChatOpenAI(model="gpt-4o", http_client=http_clients.client, http_async_client=http_clients.async_client)
 llm_with_tools = llm.bind_tools(tools)
+llm_with_plan = llm.bind_tools(tools + [execute_plan])
 
 # System message
 sys_msg = SystemMessage(content="You are a helpful assistant tasked with writing performing arithmetic on a set of inputs.")
+plan_msg = SystemMessage(content=sys_msg.content + " When you know every step up front, make them in a single execute_plan call.")
 
 # Node
-def assistant(state: MessagesState):
+def assistant(state: MessagesState, config: RunnableConfig):
+   if config.get("configurable", {}).get("tool_mode") == "plan":
+      return {"messages": [llm_with_plan.invoke([plan_msg] + state["messages"])]}
    return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
 
 # Build graph
 builder = StateGraph(MessagesState)
 builder.add_node("assistant", assistant)
-builder.add_node("tools", ToolNode(tools))
+builder.add_node("tools", tool_execution.tool_node(tools + [execute_plan]))
 builder.add_edge(START, "assistant")
 builder.add_conditional_edges(
     "assistant",
@@ -0,0 +1,288 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterator, List, NamedTuple, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+### Indexed history
+#
+# get_state_history() materializes every snapshot of a thread, newest first, so finding the
+# checkpoint to replay or fork from on a long thread loads all of them. IndexedSaver wraps a
+# checkpointer and records a small row per checkpoint in a side index (step, timestamp, the
+# nodes that ran, the messages it added). Lookups return HistoryEntry rows; the state of an
+# entry is only loaded when asked for, one checkpoint at a time.
+#
+#   memory = IndexedSaver(MemorySaver())
+#   graph = builder.compile(checkpointer=memory)
+#   entry = memory.index.at_step(thread, 5000)
+#   graph.update_state(entry.config, {...}) # fork without loading the other snapshots
+
+schema = """
+CREATE TABLE IF NOT EXISTS history (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    step INTEGER,
+    ts TEXT,
+    source TEXT,
+    nodes TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE INDEX IF NOT EXISTS history_step ON history (thread_id, checkpoint_ns, step);
+CREATE INDEX IF NOT EXISTS history_ts ON history (thread_id, checkpoint_ns, ts);
+CREATE TABLE IF NOT EXISTS history_nodes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    node TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, node, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS history_messages (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, message_id, checkpoint_id)
+);
+"""
+
+class HistoryEntry(NamedTuple):
+    config: RunnableConfig # Pass to graph.get_state / update_state / stream to load, fork or replay
+    parent_config: Optional[RunnableConfig]
+    step: int
+    ts: str
+    source: str # input, loop, update or fork
+    nodes: List[str] # Nodes that ran to produce this checkpoint
+
+def thread_key(config: RunnableConfig):
+    configurable = config["configurable"]
+    return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+class HistoryIndex:
+    """ Side index over checkpoint history: lookups by step, node, timestamp or message id, and pagination
+
+    path: SQLite file for the index (":memory:" by default; use a file next to a persistent checkpointer)
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(schema)
+        self.lock = threading.Lock()
+
+    ## Writes
+
+    def add(self, config: RunnableConfig, checkpoint_id: str, parent_id: Optional[str], step: int, ts: str,
+            source: str, nodes: List[str], message_ids: List[str]):
+        thread_id, checkpoint_ns = thread_key(config)
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, parent_id, step, ts, source, ",".join(nodes)),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO history_nodes VALUES (?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, node, checkpoint_id) for node in nodes],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO history_messages VALUES (?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, message_id, checkpoint_id) for message_id in message_ids],
+            )
+            self.conn.execute("COMMIT")
+
+    def delete_thread(self, thread_id: str):
+        with self.lock:
+            for table in ("history", "history_nodes", "history_messages"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+
+    ## Lookups
+
+    columns = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, step, ts, source, nodes"
+
+    def entry(self, row) -> HistoryEntry:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, step, ts, source, nodes = row
+        def config(id):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": id}}
+        return HistoryEntry(config(checkpoint_id), config(parent_id) if parent_id else None,
+                            step, ts, source, nodes.split(",") if nodes else [])
+
+    def query(self, where: str, params: tuple, order: str = "checkpoint_id DESC", limit: Optional[int] = None) -> List[HistoryEntry]:
+        sql = f"SELECT {self.columns} FROM history WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self.entry(row) for row in rows]
+
+    def at_step(self, config: RunnableConfig, step: int) -> Optional[HistoryEntry]:
+        """ Checkpoint at `step`; the latest one if forks produced several """
+        found = self.query("thread_id = ? AND checkpoint_ns = ? AND step = ?", (*thread_key(config), step), limit=1)
+        return found[0] if found else None
+
+    def at_time(self, config: RunnableConfig, when: datetime) -> Optional[HistoryEntry]:
+        """ Last checkpoint written at or before `when` (timezone-aware) """
+        # Checkpoint timestamps are ISO strings in UTC, so they compare as text
+        when = when.astimezone(timezone.utc).isoformat()
+        found = self.query("thread_id = ? AND checkpoint_ns = ? AND ts <= ?", (*thread_key(config), when),
+                           order="ts DESC", limit=1)
+        return found[0] if found else None
+
+    def by_node(self, config: RunnableConfig, node: str, limit: Optional[int] = None) -> List[HistoryEntry]:
+        """ Checkpoints written after `node` ran, newest first """
+        thread_id, checkpoint_ns = thread_key(config)
+        return self.query(
+            "thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN "
+            "(SELECT checkpoint_id FROM history_nodes WHERE thread_id = ? AND checkpoint_ns = ? AND node = ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns, node), limit=limit,
+        )
+
+    def by_message(self, config: RunnableConfig, message_id: str) -> List[HistoryEntry]:
+        """ Checkpoints that added (or replaced) the message, oldest first """
+        thread_id, checkpoint_ns = thread_key(config)
+        return self.query(
+            "thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN "
+            "(SELECT checkpoint_id FROM history_messages WHERE thread_id = ? AND checkpoint_ns = ? AND message_id = ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns, message_id), order="checkpoint_id ASC",
+        )
+
+    def page(self, config: RunnableConfig, before: Optional[str] = None, limit: int = 50) -> List[HistoryEntry]:
+        """ Up to `limit` entries, newest first, older than checkpoint id `before` """
+        thread_id, checkpoint_ns = thread_key(config)
+        if before is None:
+            return self.query("thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns), limit=limit)
+        return self.query("thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", (thread_id, checkpoint_ns, before), limit=limit)
+
+    def iterate(self, config: RunnableConfig, page_size: int = 50) -> Iterator[HistoryEntry]:
+        """ Every entry, newest first, reading one page at a time """
+        before = None
+        while page := self.page(config, before, page_size):
+            yield from page
+            before = page[-1].config["configurable"]["checkpoint_id"]
+
+    def count(self, config: RunnableConfig) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT count(*) FROM history WHERE thread_id = ? AND checkpoint_ns = ?",
+                                     thread_key(config)).fetchone()[0]
+
+### Checkpointer wrapper
+
+def message_ids(checkpoint) -> dict:
+    """ id -> message for the messages channel of a checkpoint """
+    messages = checkpoint["channel_values"].get("messages")
+    return {m.id: m for m in messages if getattr(m, "id", None)} if isinstance(messages, list) else {}
+
+def nodes_run(checkpoint, parent) -> List[str]:
+    """ Nodes whose versions_seen moved since the parent checkpoint, i.e. the nodes that just ran """
+    seen = checkpoint.get("versions_seen", {})
+    before = parent.get("versions_seen", {}) if parent else {}
+    return sorted(node for node, versions in seen.items() if versions and versions != before.get(node))
+
+class IndexedSaver(BaseCheckpointSaver):
+    """ Pass-through checkpointer that keeps a HistoryIndex up to date
+
+    saver: the checkpointer that stores the data (MemorySaver, SqliteSaver, ...)
+    index: where to record history (in memory by default)
+    max_tracked: parent checkpoints kept in memory to diff against (others are read back from `saver`)
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, index: Optional[HistoryIndex] = None, max_tracked: int = 1024):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.index = index or HistoryIndex()
+        self.max_tracked = max_tracked
+        # checkpoint id -> (versions_seen, {message id: message}) of recently written checkpoints
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    def parent_of(self, config: RunnableConfig):
+        """ (versions_seen, messages) of the checkpoint `config` points at, or None """
+        parent_id = config["configurable"].get("checkpoint_id")
+        if parent_id is None:
+            return None
+        with self.lock:
+            if parent_id in self.recent:
+                return self.recent[parent_id]
+        saved = self.saver.get_tuple(config)
+        return (saved.checkpoint.get("versions_seen", {}), message_ids(saved.checkpoint)) if saved else None
+
+    async def aparent_of(self, config: RunnableConfig):
+        parent_id = config["configurable"].get("checkpoint_id")
+        if parent_id is None:
+            return None
+        with self.lock:
+            if parent_id in self.recent:
+                return self.recent[parent_id]
+        saved = await self.saver.aget_tuple(config)
+        return (saved.checkpoint.get("versions_seen", {}), message_ids(saved.checkpoint)) if saved else None
+
+    def record(self, config: RunnableConfig, checkpoint, metadata, parent):
+        messages = message_ids(checkpoint)
+        parent_seen, parent_messages = parent or ({}, {})
+        # New messages, and messages replaced under the same id (as when forking with an edited message)
+        added = [id for id, message in messages.items()
+                 if (old := parent_messages.get(id)) is not message and old != message]
+        self.index.add(config, checkpoint["id"], config["configurable"].get("checkpoint_id"), metadata.get("step"),
+                       checkpoint["ts"], metadata.get("source"), nodes_run(checkpoint, {"versions_seen": parent_seen}), added)
+        with self.lock:
+            self.recent[checkpoint["id"]] = (checkpoint.get("versions_seen", {}), messages)
+            while len(self.recent) > self.max_tracked:
+                self.recent.popitem(last=False)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = self.saver.put(config, checkpoint, metadata, new_versions)
+        self.record(config, checkpoint, metadata, self.parent_of(config))
+        return saved
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        saved = await self.saver.aput(config, checkpoint, metadata, new_versions)
+        self.record(config, checkpoint, metadata, await self.aparent_of(config))
+        return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        return self.saver.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await self.saver.aput_writes(config, writes, task_id, task_path)
+
+    def get_tuple(self, config):
+        return self.saver.get_tuple(config)
+
+    async def aget_tuple(self, config):
+        return await self.saver.aget_tuple(config)
+
+    def list(self, config, **kwargs):
+        return self.saver.list(config, **kwargs)
+
+    def alist(self, config, **kwargs):
+        return self.saver.alist(config, **kwargs)
+
+    def delete_thread(self, thread_id):
+        self.index.delete_thread(thread_id)
+        return self.saver.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id):
+        self.index.delete_thread(thread_id)
+        return await self.saver.adelete_thread(thread_id)
+
+    def reindex(self, config: RunnableConfig) -> int:
+        """ Build the index for a thread written before the saver was wrapped (reads its history once) """
+        saved = list(self.saver.list(config))
+        by_id = {s.checkpoint["id"]: s for s in saved}
+        for s in reversed(saved):
+            parent_id = s.parent_config["configurable"]["checkpoint_id"] if s.parent_config else None
+            parent = by_id.get(parent_id)
+            parent = (parent.checkpoint.get("versions_seen", {}), message_ids(parent.checkpoint)) if parent else None
+            self.record({"configurable": {**s.config["configurable"], "checkpoint_id": parent_id}}, s.checkpoint, s.metadata, parent)
+        return len(saved)
@@ -0,0 +1,286 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+from langchain_core.messages import ToolMessage
+from langgraph.errors import GraphBubbleUp
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE, ToolCallRequest
+
+### Tool execution
+#
+# ToolNode already runs the tool calls of one AI message side by side: on a thread pool when
+# the graph is invoked, with asyncio.gather when it is awaited (max_concurrency in the config
+# caps both). What it doesn't do is stop waiting: one slow tool holds up the whole step, and
+# an exception other than bad arguments fails the run. ToolExecution hooks into ToolNode's
+# tool call wrappers to add:
+# - a timeout per tool; a call that overruns gets an error ToolMessage and the step moves on
+#   (a sync tool can't be killed, so its thread finishes in the background)
+# - error ToolMessages for tools that raise, e.g. divide by zero, so the model can recover;
+#   the details for code are in the message artifact
+# - a latency histogram per tool and outcome
+# - optionally, a ToolCache serving repeated calls to pure tools
+#
+#   tool_execution = ToolExecution(timeout=10, timeouts={"divide": 1})
+#   builder.add_node("tools", tool_execution.tool_node(tools))
+#
+# call / acall run a single tool call the same way outside a ToolNode (execute_plan's steps).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class ToolLatency:
+    """ Histogram of tool call durations per (tool, status), status being success, error or timeout """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # (tool, status) -> [count per bucket (+Inf last), sum]
+        self.values = {}
+
+    def observe(self, tool: str, status: str, seconds: float):
+        with self.lock:
+            counts, _ = entry = self.values.setdefault((tool, status), [[0] * (len(self.buckets) + 1), 0.0])
+            counts[bisect_left(self.buckets, seconds)] += 1
+            entry[1] += seconds
+
+    def quantile(self, tool: str, q: float, status: str = "success") -> Optional[float]:
+        """ Upper bound of the bucket holding the q-th quantile (inf if it is past the last bucket) """
+        with self.lock:
+            counts = list(self.values.get((tool, status), [[]])[0])
+        total = sum(counts)
+        if not total:
+            return None
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= q * total:
+                return bound
+
+    def summary(self) -> Dict[str, dict]:
+        """ Calls, mean seconds and p50/p95 bucket bounds per tool and status """
+        with self.lock:
+            keys = sorted(self.values)
+            totals = {key: (sum(self.values[key][0]), self.values[key][1]) for key in keys}
+        return {
+            f"{tool}:{status}": {"calls": count, "mean": total / count,
+                                 "p50": self.quantile(tool, 0.5, status), "p95": self.quantile(tool, 0.95, status)}
+            for (tool, status), (count, total) in totals.items()
+        }
+
+    def render(self, name: str = "langgraph_tool_duration_seconds") -> str:
+        """ Prometheus text exposition """
+        lines = [f"# HELP {name} Tool call wall time", f"# TYPE {name} histogram"]
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for (tool, status), (counts, total) in items:
+            labels = f'tool="{tool}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {total:g}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+### Tool result cache
+#
+# Pure tools (same arguments, same result) can be answered from earlier calls, across turns
+# and threads. Tools are marked when registering the cache, or with metadata on the tool:
+#
+#   tool_cache = ToolCache(maxsize=1024)
+#   tool_cache.pure(add, multiply, divide)
+#   tool_cache.stable(search, ttl=300) # impure, but fine to reuse for a while
+#   StructuredTool.from_function(..., metadata={"cache": True, "cache_ttl": 300})
+#
+# Only successful ToolMessages are cached. A hit builds a new ToolMessage for the current
+# tool call id, so the model sees a normal reply to the call it made.
+
+class ToolCache:
+    """ Bounded LRU of tool results keyed by (tool name, arguments), with an optional TTL per tool
+
+    maxsize: entries kept across all tools; the least recently used are evicted first
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.policies = {} # tool name -> ttl in seconds, None for no expiry
+        self.entries = OrderedDict() # (tool, args) -> (expires at, content, artifact)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def pure(self, *tools):
+        for tool in tools:
+            self.policies[getattr(tool, "name", None) or tool.__name__] = None
+
+    def stable(self, *tools, ttl: float):
+        for tool in tools:
+            self.policies[getattr(tool, "name", None) or tool.__name__] = ttl
+
+    def cacheable(self, tool) -> tuple:
+        """ (cacheable, ttl) for a tool registered here or carrying cache metadata """
+        if tool is None:
+            return False, None
+        if tool.name in self.policies:
+            return True, self.policies[tool.name]
+        metadata = tool.metadata or {}
+        return bool(metadata.get("cache")), metadata.get("cache_ttl")
+
+    def key(self, call: dict) -> tuple:
+        return call["name"], json.dumps(call["args"], sort_keys=True, default=str)
+
+    def get(self, request) -> Optional[ToolMessage]:
+        cacheable, _ = self.cacheable(request.tool)
+        if not cacheable:
+            return None
+        call = request.tool_call
+        key = self.key(call)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        _, content, artifact = entry
+        return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], artifact=artifact)
+
+    def put(self, request, result):
+        cacheable, ttl = self.cacheable(request.tool)
+        if not cacheable or not isinstance(result, ToolMessage) or result.status == "error":
+            return
+        expires = time.monotonic() + ttl if ttl is not None else None
+        key = self.key(request.tool_call)
+        with self.lock:
+            self.entries[key] = (expires, result.content, result.artifact)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class ToolExecution:
+    """ Timeouts, error ToolMessages and latency histograms for a ToolNode
+
+    timeout: seconds allowed per tool call by default (None for no limit)
+    timeouts: per-tool overrides, {tool name: seconds}
+    max_workers: threads running sync tool calls that have a timeout
+    cache: ToolCache for repeated calls to pure tools (hits are recorded with status "cached")
+    """
+
+    def __init__(self, timeout: Optional[float] = 30, timeouts: Optional[Dict[str, float]] = None, max_workers: int = 32,
+                 cache: Optional[ToolCache] = None):
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="tool")
+        self.latency = ToolLatency()
+        self.cache = cache
+
+    def tool_node(self, tools, **kwargs) -> ToolNode:
+        return ToolNode(tools, wrap_tool_call=self.wrap, awrap_tool_call=self.awrap, **kwargs)
+
+    def timeout_for(self, tool: str) -> Optional[float]:
+        return self.timeouts.get(tool, self.timeout)
+
+    ## Results
+
+    def error(self, call: dict, content: str, error: str, message: str) -> ToolMessage:
+        return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], status="error",
+                           artifact={"error": error, "message": message, "tool": call["name"], "args": call["args"]})
+
+    def failed(self, call: dict, error: Exception) -> ToolMessage:
+        return self.error(call, TOOL_CALL_ERROR_TEMPLATE.format(error=repr(error)), type(error).__name__, str(error))
+
+    def timed_out(self, call: dict, timeout: float) -> ToolMessage:
+        message = f"Tool '{call['name']}' did not finish within {timeout:g}s"
+        return self.error(call, f"Error: {message}. Try again or use another approach.", "Timeout", message)
+
+    def record(self, call: dict, result, started: float, status: Optional[str] = None):
+        if status is None:
+            status = "error" if isinstance(result, ToolMessage) and result.status == "error" else "success"
+        self.latency.observe(call["name"], status, time.perf_counter() - started)
+
+    ## ToolNode wrappers
+
+    def cached(self, request, started: float) -> Optional[ToolMessage]:
+        hit = self.cache.get(request) if self.cache is not None else None
+        if hit is not None:
+            self.record(request.tool_call, hit, started, "cached")
+        return hit
+
+    def store(self, request, result):
+        if self.cache is not None:
+            self.cache.put(request, result)
+
+    def wrap(self, request, execute):
+        call = request.tool_call
+        timeout = self.timeout_for(call["name"])
+        started = time.perf_counter()
+        if (hit := self.cached(request, started)) is not None:
+            return hit
+        try:
+            if timeout is None:
+                result = execute(request)
+            else:
+                # Run on our own pool so we can stop waiting; copy the context so callbacks still nest
+                future = self.executor.submit(contextvars.copy_context().run, execute, request)
+                if not wait([future], timeout).done:
+                    future.cancel()
+                    result = self.timed_out(call, timeout)
+                    self.record(call, result, started, "timeout")
+                    return result
+                result = future.result()
+        except GraphBubbleUp:
+            raise
+        except Exception as error:
+            result = self.failed(call, error)
+        self.record(call, result, started)
+        self.store(request, result)
+        return result
+
+    async def awrap(self, request, execute):
+        call = request.tool_call
+        timeout = self.timeout_for(call["name"])
+        started = time.perf_counter()
+        if (hit := self.cached(request, started)) is not None:
+            return hit
+        task = asyncio.ensure_future(execute(request))
+        try:
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                result = self.timed_out(call, timeout)
+                self.record(call, result, started, "timeout")
+                return result
+            result = task.result()
+        except GraphBubbleUp:
+            raise
+        except Exception as error:
+            result = self.failed(call, error)
+        finally:
+            # Also when the step itself is cancelled
+            task.cancel()
+        self.record(call, result, started)
+        self.store(request, result)
+        return result
+
+    ## Direct calls
+
+    def call(self, tool, call: dict, config=None) -> ToolMessage:
+        """ Run one tool call (name, args, id) as the ToolNode would: timeout, cache, error ToolMessage """
+        request = ToolCallRequest(tool_call=call, tool=tool, state=None, runtime=None)
+        return self.wrap(request, lambda request: request.tool.invoke({**request.tool_call, "type": "tool_call"}, config))
+
+    async def acall(self, tool, call: dict, config=None) -> ToolMessage:
+        request = ToolCallRequest(tool_call=call, tool=tool, state=None, runtime=None)
+        return await self.awrap(request, lambda request: request.tool.ainvoke({**request.tool_call, "type": "tool_call"}, config))
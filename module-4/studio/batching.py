@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from langchain_core.runnables import Runnable
+
+### Micro-batching
+#
+# A Send() fan-out makes one model call per branch. MicroBatcher collects the calls that
+# arrive within `max_wait` seconds of the first one, up to `max_batch` of them, runs them
+# with a single runnable.batch / abatch, and hands each caller its own result (or error).
+# Only a runnable whose batch / abatch serves the whole batch in one provider request
+# (a custom or self-hosted model with a batch endpoint) sends fewer requests. ChatOpenAI's
+# batch is the default Runnable one: it still sends one HTTP request per item, concurrently,
+# so batching it saves nothing and only adds up to max_wait of latency per call. (OpenAI's
+# Batch API answers within hours, not within a graph run.)
+#
+# The knobs trade per-item latency for fewer, fuller requests: every call may wait up to
+# max_wait for company, and a batch is sent as soon as max_batch calls are waiting.
+
+class MicroBatcher:
+    """ Group single invoke / ainvoke calls into runnable.batch / abatch calls
+
+    max_batch: most items per batch; reaching it sends the batch immediately
+    max_wait: seconds the first item of a batch waits for others to join
+    Both can be overridden per call.
+    """
+
+    def __init__(self, runnable: Runnable, max_batch: int = 16, max_wait: float = 0.02):
+        self.runnable = runnable
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.pending = [] # (input, config, future) from threads
+        self.timer = None
+        self.apending = {} # event loop -> [(input, config, future)]
+        self.timers = {} # event loop -> TimerHandle
+        self.tasks = set()
+        # Metrics
+        self.batches = 0
+        self.items = 0
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {"batches": self.batches, "items": self.items,
+                    "mean_batch_size": self.items / self.batches if self.batches else 0.0}
+
+    def count(self, size: int):
+        with self.lock:
+            self.batches += 1
+            self.items += size
+
+    @staticmethod
+    def scatter(batch: list, results: list):
+        for (_, _, future), result in zip(batch, results):
+            if future.done(): # The caller was cancelled
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    ## Threads
+
+    def invoke(self, input, config=None, max_batch: Optional[int] = None, max_wait: Optional[float] = None):
+        max_batch = max_batch or self.max_batch
+        max_wait = self.max_wait if max_wait is None else max_wait
+        future = Future()
+        batch = None
+        with self.lock:
+            self.pending.append((input, config, future))
+            if len(self.pending) >= max_batch:
+                batch = self.take(max_batch, max_wait)
+            elif self.timer is None:
+                self.start_timer(max_wait, max_batch)
+        if batch:
+            # The call that fills a batch sends it
+            self.run(batch)
+        return future.result()
+
+    def start_timer(self, wait: float, max_batch: int):
+        self.timer = threading.Timer(wait, self.flush, (max_batch, wait))
+        self.timer.daemon = True
+        self.timer.start()
+
+    def take(self, max_batch: int, max_wait: float) -> list:
+        """ Pop the next batch, restarting the timer with the same wait for the rest; call with the lock held """
+        batch, self.pending = self.pending[:max_batch], self.pending[max_batch:]
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            self.start_timer(max_wait, max_batch)
+        return batch
+
+    def flush(self, max_batch: int, max_wait: float):
+        with self.lock:
+            self.timer = None
+            batch = self.take(max_batch, max_wait)
+        if batch:
+            self.run(batch)
+
+    def run(self, batch: list):
+        inputs = [input for input, _, _ in batch]
+        configs = [config or {} for _, config, _ in batch]
+        self.count(len(batch))
+        try:
+            results = self.runnable.batch(inputs, configs, return_exceptions=True)
+        except Exception as error:
+            results = [error] * len(batch)
+        self.scatter(batch, results)
+
+    ## Event loops
+
+    async def ainvoke(self, input, config=None, max_batch: Optional[int] = None, max_wait: Optional[float] = None):
+        max_batch = max_batch or self.max_batch
+        max_wait = self.max_wait if max_wait is None else max_wait
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self.apending.setdefault(loop, [])
+        pending.append((input, config, future))
+        if len(pending) >= max_batch:
+            self.aflush(loop, max_batch, max_wait)
+        elif loop not in self.timers:
+            self.timers[loop] = loop.call_later(max_wait, self.aflush, loop, max_batch, max_wait)
+        return await future
+
+    def aflush(self, loop, max_batch: int, max_wait: float):
+        handle = self.timers.pop(loop, None)
+        if handle is not None:
+            handle.cancel()
+        pending = self.apending.pop(loop, [])
+        batch, rest = pending[:max_batch], pending[max_batch:]
+        if rest:
+            self.apending[loop] = rest
+            self.timers[loop] = loop.call_later(max_wait, self.aflush, loop, max_batch, max_wait)
+        if batch:
+            task = loop.create_task(self.arun(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def arun(self, batch: list):
+        inputs = [input for input, _, _ in batch]
+        configs = [config or {} for _, config, _ in batch]
+        self.count(len(batch))
+        try:
+            results = await self.runnable.abatch(inputs, configs, return_exceptions=True)
+        except Exception as error:
+            results = [error] * len(batch)
+        self.scatter(batch, results)
@@ -0,0 +1,158 @@
+import logging
+import re
+import threading
+from collections import Counter
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+### Token counting
+
+encoder = None
+
+def count_tokens(text: str) -> int:
+    """ Count gpt-4o tokens with tiktoken, or estimate ~4 characters per token if the encoding can't be loaded """
+    global encoder
+    if encoder is None:
+        try:
+            import tiktoken
+            encoder = tiktoken.encoding_for_model("gpt-4o")
+        except Exception:
+            # tiktoken downloads its encodings on first use; stay usable offline
+            encoder = False
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+### Context packing
+
+# Matches the documents written by format_web_docs / format_wiki_docs
+document_pattern = re.compile(r'<Document (href|source)="([^"]*)"([^>]*)/>\n(.*?)\n</Document>', re.DOTALL)
+
+class Chunk(NamedTuple):
+    doc: int # Index of the document the chunk came from
+    position: int # Position of the chunk within the document
+    text: str
+    tokens: int
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens_in: int # Tokens in the context as it used to be sent, duplicates included (estimated from the chunk counts)
+    tokens_out: int
+    documents: int # Unique documents kept
+
+def words(text: str) -> Counter:
+    return Counter(re.findall(r"\w+", text.lower()))
+
+def split_tokens(text: str, chunk_tokens: int) -> List[str]:
+    """ Cut text into pieces of at most `chunk_tokens` tokens (~4 characters each without tiktoken) """
+    count_tokens("") # Loads the encoder
+    if encoder:
+        tokens = encoder.encode(text, disallowed_special=())
+        return [encoder.decode(tokens[i:i + chunk_tokens]) for i in range(0, len(tokens), chunk_tokens)]
+    size = chunk_tokens * 4
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def split_paragraph(paragraph: str, chunk_tokens: int) -> List[str]:
+    """ Split a paragraph over `chunk_tokens` at sentence ends, and sentences still over it at token boundaries """
+    if count_tokens(paragraph) <= chunk_tokens:
+        return [paragraph]
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        if count_tokens(sentence) > chunk_tokens:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.extend(split_tokens(sentence, chunk_tokens))
+            continue
+        candidate = f"{current} {sentence}" if current else sentence
+        if current and count_tokens(candidate) > chunk_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_chunks(text: str, chunk_tokens: int) -> List[str]:
+    """ Split on paragraphs, merging small ones and splitting oversized ones, so each chunk stays around `chunk_tokens` """
+    chunks, current = [], ""
+    paragraphs = [piece for paragraph in re.split(r"\n\s*\n", text) for piece in split_paragraph(paragraph, chunk_tokens)]
+    for paragraph in paragraphs:
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if current and count_tokens(candidate) > chunk_tokens:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_context(context: list, query: str, token_budget: int = 4000, chunk_tokens: int = 300) -> PackedContext:
+    """ Dedupe source documents by href / source, then pack the chunks most relevant to `query` into `token_budget` tokens
+
+    Kept chunks are re-emitted as <Document .../> blocks in their original order, so citations still work.
+    """
+
+    # Unique documents, first occurrence wins; copies counts the occurrences of each for tokens_in
+    headers, bodies, seen, copies = [], [], {}, []
+    for entry in context:
+        for kind, source, rest, body in document_pattern.findall(entry):
+            if source in seen:
+                copies[seen[source]] += 1
+                continue
+            seen[source] = len(bodies)
+            headers.append(f'<Document {kind}="{source}"{rest}/>')
+            bodies.append(body)
+            copies.append(1)
+
+    # Score every chunk by overlap with the query, normalised by length
+    query_words = words(query)
+    scored = []
+    for doc, body in enumerate(bodies):
+        for position, text in enumerate(split_chunks(body, chunk_tokens)):
+            chunk = Chunk(doc, position, text, count_tokens(text))
+            overlap = sum(min(count, query_words[word]) for word, count in words(text).items())
+            scored.append((overlap / (chunk.tokens ** 0.5 or 1), chunk))
+
+    # Greedy packing, best first; a small allowance per document covers the tags
+    kept, used = [], 0
+    for _, chunk in sorted(scored, key=lambda item: (-item[0], item[1].doc, item[1].position)):
+        cost = chunk.tokens + 20
+        if used + cost <= token_budget:
+            kept.append(chunk)
+            used += cost
+
+    # Back to document order
+    by_doc = {}
+    for chunk in sorted(kept, key=lambda chunk: (chunk.doc, chunk.position)):
+        by_doc.setdefault(chunk.doc, []).append(chunk.text)
+    text = "\n\n---\n\n".join(
+        f"{headers[doc]}\n" + "\n\n".join(chunks) + "\n</Document>" for doc, chunks in by_doc.items()
+    )
+
+    # Re-encoding the raw context only for this statistic would cost more than the packing
+    tokens_in = sum(chunk.tokens * copies[chunk.doc] for _, chunk in scored) + 20 * sum(copies)
+    packed = PackedContext(text, tokens_in, count_tokens(text), len(by_doc))
+    record(packed)
+    return packed
+
+### Reporting
+
+stats = {"calls": 0, "tokens_in": 0, "tokens_out": 0}
+stats_lock = threading.Lock()
+
+def record(packed: PackedContext):
+    with stats_lock:
+        stats["calls"] += 1
+        stats["tokens_in"] += packed.tokens_in
+        stats["tokens_out"] += packed.tokens_out
+    logger.info("Context packed to %d tokens from %d (%d saved, %d documents)",
+                packed.tokens_out, packed.tokens_in, packed.tokens_in - packed.tokens_out, packed.documents)
+
+def tokens_saved() -> int:
+    """ Total tokens kept out of prompts so far in this process """
+    with stats_lock:
+        return stats["tokens_in"] - stats["tokens_out"]
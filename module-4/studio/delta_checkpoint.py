@@ -0,0 +1,180 @@
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Iterator, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+
+### Delta checkpoints
+#
+# The interview sub-graph appends to `messages` and `context` on every step, so a plain
+# checkpointer re-serializes the whole (growing) lists each superstep. This saver wraps any
+# checkpointer and, for the chosen namespaces and channels, stores only the entries appended
+# since the parent checkpoint, with a full snapshot every `snapshot_every` checkpoints.
+# Reads rebuild the lists by replaying deltas on top of the nearest full snapshot.
+
+DELTA_KEY = "__delta__"
+
+def is_delta(value) -> bool:
+    return isinstance(value, dict) and DELTA_KEY in value
+
+class DeltaCheckpointSaver(BaseCheckpointSaver):
+    """ Store append-only list channels as deltas against the parent checkpoint
+
+    saver: the checkpointer that actually stores data (MemorySaver, SqliteSaver, ...)
+    channels: list channels that only ever grow by appending
+    namespaces: checkpoint namespace prefixes to apply deltas to; "conduct_interview" covers
+        the interview sub-graphs of the research assistant, "" (the default) covers everything
+    snapshot_every: longest chain of deltas before a full snapshot is written
+    max_tracked: number of (thread, namespace) pairs whose latest lists are kept in memory to diff against
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, channels: Sequence[str] = ("messages", "context"),
+                 namespaces: Sequence[str] = ("",), snapshot_every: int = 20, max_tracked: int = 1024):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.channels = tuple(channels)
+        self.namespaces = tuple(namespaces)
+        self.snapshot_every = snapshot_every
+        self.max_tracked = max_tracked
+        # Last full values written per (thread_id, checkpoint_ns): (checkpoint_id, depth, {channel: list})
+        self.latest = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    def applies(self, config: RunnableConfig) -> bool:
+        return config["configurable"].get("checkpoint_ns", "").startswith(self.namespaces)
+
+    ### Writes
+
+    def encode(self, config: RunnableConfig, checkpoint):
+        """ Replace appended list channels by deltas against the parent checkpoint """
+        if not self.applies(config):
+            return checkpoint
+        key = (config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", ""))
+        parent_id = config["configurable"].get("checkpoint_id")
+        values = checkpoint["channel_values"]
+        full = {ch: list(values[ch]) for ch in self.channels if isinstance(values.get(ch), list)}
+        with self.lock:
+            previous = self.latest.pop(key, None)
+        if previous is None or previous[0] != parent_id or previous[1] + 1 >= self.snapshot_every:
+            # No known parent state, or the delta chain is long enough: write a full snapshot
+            self.track(key, (checkpoint["id"], 0, full))
+            return checkpoint
+
+        encoded = dict(values)
+        for ch, items in full.items():
+            old = previous[2].get(ch, [])
+            if len(items) >= len(old) and items[:len(old)] == old:
+                encoded[ch] = {DELTA_KEY: parent_id, "start": len(old), "items": items[len(old):]}
+        self.track(key, (checkpoint["id"], previous[1] + 1, full))
+        return {**checkpoint, "channel_values": encoded}
+
+    def track(self, key, entry):
+        with self.lock:
+            self.latest[key] = entry
+            while len(self.latest) > self.max_tracked:
+                self.latest.popitem(last=False)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        return self.saver.put(config, self.encode(config, checkpoint), metadata, new_versions)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await self.saver.aput(config, self.encode(config, checkpoint), metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        return self.saver.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await self.saver.aput_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id):
+        with self.lock:
+            for key in [key for key in self.latest if key[0] == thread_id]:
+                del self.latest[key]
+        return self.saver.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id):
+        with self.lock:
+            for key in [key for key in self.latest if key[0] == thread_id]:
+                del self.latest[key]
+        return await self.saver.adelete_thread(thread_id)
+
+    ### Reads
+
+    def base_config(self, saved: CheckpointTuple, value) -> RunnableConfig:
+        return {"configurable": {**saved.config["configurable"], "checkpoint_id": value[DELTA_KEY]}}
+
+    def rebuild(self, base_value, deltas: list) -> list:
+        """ Replay deltas (newest first) on top of the full list they are based on """
+        rebuilt = list(base_value or [])
+        for delta in reversed(deltas):
+            rebuilt = rebuilt[:delta["start"]] + list(delta["items"])
+        return rebuilt
+
+    def resolve(self, saved: CheckpointTuple, fetched: dict) -> CheckpointTuple:
+        """ Rebuild delta-encoded lists from checkpoints already in `fetched` (by id); returns the
+        config of the next base checkpoint to fetch instead if one is missing
+
+        Raises ValueError when a base checkpoint was deleted, rather than returning partial lists.
+        """
+        values = dict(saved.checkpoint["channel_values"])
+        for ch, value in values.items():
+            deltas = []
+            # Walk back to the nearest checkpoint holding the full list
+            while is_delta(value):
+                deltas.append(value)
+                if value[DELTA_KEY] not in fetched:
+                    return self.base_config(saved, value)
+                base = fetched[value[DELTA_KEY]]
+                if base is None:
+                    raise ValueError(f"Checkpoint {saved.checkpoint['id']}: channel {ch!r} is a delta on checkpoint "
+                                     f"{value[DELTA_KEY]}, which no longer exists; its value can't be rebuilt")
+                value = base.checkpoint["channel_values"].get(ch)
+            if deltas and value is None and deltas[-1]["start"] > 0:
+                raise ValueError(f"Checkpoint {saved.checkpoint['id']}: channel {ch!r} is missing from the base "
+                                 f"checkpoint its deltas start from")
+            if deltas:
+                values[ch] = self.rebuild(value, deltas)
+        return saved._replace(checkpoint={**saved.checkpoint, "channel_values": values})
+
+    def get_tuple(self, config):
+        saved = self.saver.get_tuple(config)
+        if saved is None:
+            return None
+        fetched = {}
+        while isinstance(result := self.resolve(saved, fetched), dict):
+            fetched[result["configurable"]["checkpoint_id"]] = self.saver.get_tuple(result)
+        return result
+
+    async def aget_tuple(self, config):
+        saved = await self.saver.aget_tuple(config)
+        if saved is None:
+            return None
+        fetched = {}
+        while isinstance(result := self.resolve(saved, fetched), dict):
+            fetched[result["configurable"]["checkpoint_id"]] = await self.saver.aget_tuple(result)
+        return result
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        # Savers may hold a lock while listing, so read the page before fetching any bases
+        page = list(self.saver.list(config, filter=filter, before=before, limit=limit))
+        fetched = {saved.checkpoint["id"]: saved for saved in page}
+        for saved in page:
+            while isinstance(result := self.resolve(saved, fetched), dict):
+                fetched[result["configurable"]["checkpoint_id"]] = self.saver.get_tuple(result)
+            yield result
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        page = [saved async for saved in self.saver.alist(config, filter=filter, before=before, limit=limit)]
+        fetched = {saved.checkpoint["id"]: saved for saved in page}
+        for saved in page:
+            while isinstance(result := self.resolve(saved, fetched), dict):
+                fetched[result["configurable"]["checkpoint_id"]] = await self.saver.aget_tuple(result)
+            yield result
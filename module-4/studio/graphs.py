@@ -0,0 +1,54 @@
+import importlib
+import logging
+import os
+import threading
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+### Lazy graph entry points
+#
+# langgraph.json points at the factories below instead of the module-level graphs, so starting
+# the server (or forking a worker) only imports this file. A graph's module, with its chat
+# model, search clients and compiled graph, is imported on the first request for that graph
+# and reused afterwards. warm_up() builds graphs ahead of the first request; set
+# LANGGRAPH_WARM_UP=1 (or a comma-separated list of graph names) to run it in the background
+# at startup.
+
+def lazy_graph(module: str, attribute: str = "graph"):
+    """ Factory returning `module.attribute`, imported on the first call """
+    lock = threading.Lock()
+    built = []
+
+    def factory(config: Optional[RunnableConfig] = None):
+        if not built:
+            with lock:
+                if not built:
+                    built.append(getattr(importlib.import_module(module), attribute))
+        return built[0]
+
+    factory.target = (module, attribute)
+    return factory
+
+parallelization = lazy_graph("parallelization")
+sub_graphs = lazy_graph("sub_graphs")
+map_reduce = lazy_graph("map_reduce")
+research_assistant = lazy_graph("research_assistant")
+research_assistant_async = lazy_graph("research_assistant", "async_graph")
+
+graphs = {"parallelization": parallelization, "sub_graphs": sub_graphs, "map_reduce": map_reduce, "research_assistant": research_assistant, "research_assistant_async": research_assistant_async}
+
+def warm_up(*names: str):
+    """ Build the named graphs (all by default) now instead of on their first request """
+    for name in names or graphs:
+        try:
+            graphs[name]()
+        except Exception:
+            # A broken graph should only fail its own requests
+            logger.exception("Warming up graph %s failed", name)
+
+if os.environ.get("LANGGRAPH_WARM_UP"):
+    names = [] if os.environ["LANGGRAPH_WARM_UP"] in ("1", "all") else os.environ["LANGGRAPH_WARM_UP"].split(",")
+    threading.Thread(target=warm_up, args=names, name="graph-warm-up", daemon=True).start()
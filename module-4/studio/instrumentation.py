@@ -0,0 +1,392 @@
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+### Metrics
+#
+# A minimal Prometheus registry: enough for histograms and counters rendered in the text
+# exposition format, without depending on prometheus_client.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+def format_labels(names, values) -> str:
+    pairs = [f'{name}="{str(value)}"'.replace("\n", " ") for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values = defaultdict(float)
+        # Parallel nodes and tools update the same metric from several threads
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self.lock:
+            self.values[key] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=DURATION_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        # label values -> [count per bucket (+Inf last), sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, _ = entry = self.values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[bucket] += 1
+            entry[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {total:g}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+### Span exporters
+#
+# Spans are plain dicts shaped like OpenTelemetry spans (OTLP JSON field names). An exporter
+# is anything with `export(spans)`; it receives the spans of one trace when its root run ends.
+
+class JsonlSpanExporter:
+    """ Append spans to a file, one JSON object per line """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, spans: list):
+        with self.lock, open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+class OpenTelemetrySpanExporter:
+    """ Replay spans through an OpenTelemetry tracer (requires opentelemetry-api) """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace
+        self.trace = trace
+        self.tracer = tracer or trace.get_tracer("langchain-academy")
+
+    def export(self, spans: list):
+        created = {}
+        # Parents start before their children, so they are always created first
+        for span in sorted(spans, key=lambda span: span["start_time_unix_nano"]):
+            parent = created.get(span["parent_span_id"])
+            context = self.trace.set_span_in_context(parent) if parent else None
+            otel_span = self.tracer.start_span(span["name"], context=context, attributes=span["attributes"],
+                                               start_time=span["start_time_unix_nano"])
+            if span["status"]["code"] == "ERROR":
+                otel_span.set_status(self.trace.Status(self.trace.StatusCode.ERROR, span["status"]["message"]))
+            created[span["span_id"]] = otel_span
+        for span in spans:
+            created[span["span_id"]].end(end_time=span["end_time_unix_nano"])
+
+### Callback handler
+
+def node_path(metadata: dict) -> str:
+    """ Node name prefixed by its parent graph nodes, e.g. conduct_interview/ask_question """
+    namespace = metadata.get("langgraph_checkpoint_ns", "")
+    parents = [part.split(":")[0] for part in namespace.split("|")[:-1] if part]
+    return "/".join(parents + [metadata["langgraph_node"]])
+
+class Instrumentation(BaseCallbackHandler):
+    """ Record node, LLM and tool timings, token usage and checkpoint sizes for a compiled graph
+
+    Attach it with `instrument(graph)` or pass it in `config["callbacks"]`. Nodes wrapped with
+    `scheduler.limited` also report how long they queued for a limiter slot.
+    """
+
+    # Timings are taken on the calling thread, not in an executor
+    run_inline = True
+
+    def __init__(self, graph: str = "graph", exporters=()):
+        self.graph = graph
+        self.exporters = list(exporters)
+        self.lock = threading.Lock()
+        self.runs = {} # run_id -> open span, or the parent run_id for runs that are not exported
+        self.traces = defaultdict(list) # trace_id -> finished spans
+        # (node, model) -> totals; one row per pair, however long the process runs
+        self.llm_totals = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+
+        labels = ("graph", "node")
+        self.node_seconds = Histogram("langgraph_node_duration_seconds", "Node wall time", labels)
+        self.queue_seconds = Histogram("langgraph_node_queue_wait_seconds", "Time a node waited for a limiter slot", labels)
+        self.node_errors = Counter("langgraph_node_errors_total", "Nodes that raised", labels)
+        self.llm_seconds = Histogram("langgraph_llm_duration_seconds", "Chat model call wall time", labels + ("model",))
+        self.llm_tokens = Counter("langgraph_llm_tokens_total", "Chat model tokens", labels + ("model", "type"))
+        self.tool_seconds = Histogram("langgraph_tool_duration_seconds", "Tool call wall time", ("graph", "tool"))
+        self.checkpoint_bytes = Histogram("langgraph_checkpoint_write_bytes", "Serialized size of checkpoint writes",
+                                          ("graph", "kind"), BYTES_BUCKETS)
+        self.metrics = [self.node_seconds, self.queue_seconds, self.node_errors, self.llm_seconds,
+                        self.llm_tokens, self.tool_seconds, self.checkpoint_bytes]
+
+    ## Span bookkeeping
+
+    def open_span(self, run_id, parent_run_id, name: str, kind: str, attributes: dict):
+        with self.lock:
+            parent = self.runs.get(parent_run_id)
+            # Skip over runs that are not exported (prompts, parsers, sequences) to the nearest span
+            while isinstance(parent, uuid.UUID):
+                parent = self.runs.get(parent)
+            self.runs[run_id] = {
+                "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+                "span_id": uuid.uuid4().hex[:16],
+                "parent_span_id": parent["span_id"] if parent else None,
+                "name": name,
+                "kind": kind,
+                "start_time_unix_nano": time.time_ns(),
+                "attributes": {"graph": self.graph, **attributes},
+                "status": {"code": "OK", "message": ""},
+            }
+
+    def skip(self, run_id, parent_run_id):
+        if parent_run_id is not None:
+            with self.lock:
+                self.runs[run_id] = parent_run_id
+
+    def close_span(self, run_id, error: Optional[BaseException] = None) -> Optional[dict]:
+        with self.lock:
+            span = self.runs.pop(run_id, None)
+            if not isinstance(span, dict):
+                return None
+            span["end_time_unix_nano"] = time.time_ns()
+            if error is not None:
+                span["status"] = {"code": "ERROR", "message": f"{type(error).__name__}: {error}"}
+            self.traces[span["trace_id"]].append(span)
+            finished = self.traces.pop(span["trace_id"]) if span["parent_span_id"] is None else None
+        if finished:
+            for exporter in self.exporters:
+                exporter.export(finished)
+        return span
+
+    @staticmethod
+    def seconds(span: dict) -> float:
+        return (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e9
+
+    ## Graph and node runs
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        name = kwargs.get("name") or ""
+        if parent_run_id is None:
+            self.open_span(run_id, None, self.graph, "graph", {})
+        elif "langgraph_node" in metadata and name == metadata["langgraph_node"]:
+            path = node_path(metadata)
+            self.open_span(run_id, parent_run_id, path, "node",
+                           {"node": path, "step": metadata.get("langgraph_step"), "queue_wait_s": 0.0})
+        else:
+            self.skip(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self.finish_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.finish_chain(run_id, error)
+
+    def finish_chain(self, run_id, error=None):
+        span = self.close_span(run_id, error)
+        if span is None or span["kind"] != "node":
+            return
+        node = span["attributes"]["node"]
+        self.node_seconds.observe(self.seconds(span), graph=self.graph, node=node)
+        self.queue_seconds.observe(span["attributes"]["queue_wait_s"], graph=self.graph, node=node)
+        if error is not None:
+            self.node_errors.inc(graph=self.graph, node=node)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name != "queue_wait":
+            return
+        with self.lock:
+            span = self.runs.get(run_id)
+            while isinstance(span, uuid.UUID):
+                span = self.runs.get(span)
+            if isinstance(span, dict) and span["kind"] == "node":
+                span["attributes"]["queue_wait_s"] += data["seconds"]
+
+    ## Chat model runs
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        node = node_path(metadata) if "langgraph_node" in metadata else ""
+        model = metadata.get("ls_model_name") or kwargs.get("name") or "unknown"
+        self.open_span(run_id, parent_run_id, f"llm {model}", "llm", {"node": node, "model": model})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self.close_span(run_id)
+        if span is None:
+            return
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = (message.response_metadata.get("token_usage") if message else None) or {}
+                if not usage and message is not None and message.usage_metadata:
+                    usage = {"prompt_tokens": message.usage_metadata["input_tokens"],
+                             "completion_tokens": message.usage_metadata["output_tokens"]}
+                prompt_tokens += usage.get("prompt_tokens") or 0
+                completion_tokens += usage.get("completion_tokens") or 0
+                if span["attributes"]["model"] == "unknown" and message is not None:
+                    span["attributes"]["model"] = message.response_metadata.get("model_name", "unknown")
+                    span["name"] = f"llm {span['attributes']['model']}"
+        attributes = span["attributes"]
+        attributes.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        labels = {"graph": self.graph, "node": attributes["node"], "model": attributes["model"]}
+        self.llm_seconds.observe(self.seconds(span), **labels)
+        self.llm_tokens.inc(prompt_tokens, type="prompt", **labels)
+        self.llm_tokens.inc(completion_tokens, type="completion", **labels)
+        with self.lock:
+            row = self.llm_totals[(attributes["node"], attributes["model"])]
+            row["calls"] += 1
+            row["seconds"] += self.seconds(span)
+            row["prompt_tokens"] += prompt_tokens
+            row["completion_tokens"] += completion_tokens
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.close_span(run_id, error)
+
+    ## Tool runs
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self.open_span(run_id, parent_run_id, f"tool {name}", "tool", {"tool": name})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.finish_tool(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.finish_tool(run_id, error)
+
+    def finish_tool(self, run_id, error=None):
+        span = self.close_span(run_id, error)
+        if span is not None:
+            self.tool_seconds.observe(self.seconds(span), graph=self.graph, tool=span["attributes"]["tool"])
+
+    ## Reporting
+
+    def prometheus(self) -> str:
+        """ All metrics in the Prometheus text exposition format """
+        with self.lock:
+            return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+    def write_prometheus(self, path: str):
+        """ Write metrics for the node_exporter textfile collector (or any scraper reading a file) """
+        with open(path, "w") as f:
+            f.write(self.prometheus())
+
+    def llm_summary(self) -> list:
+        """ LLM time per node and model, largest share of total LLM time first """
+        with self.lock:
+            rows = {key: dict(row) for key, row in self.llm_totals.items()}
+        total = sum(row["seconds"] for row in rows.values()) or 1.0
+        return sorted(
+            ({"node": node, "model": model, "share": row["seconds"] / total, **row} for (node, model), row in rows.items()),
+            key=lambda row: -row["seconds"],
+        )
+
+### Checkpoint sizes
+
+class InstrumentedSaver(BaseCheckpointSaver):
+    """ Pass-through checkpointer that records the serialized size of every write
+
+    Sizes are measured by serializing the new channel values again, so this adds serialization
+    cost; wrap the innermost saver (e.g. DeltaCheckpointSaver(InstrumentedSaver(saver))) to
+    measure what is actually stored.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, instrumentation: Instrumentation):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.instrumentation = instrumentation
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    def size(self, value) -> int:
+        return len(self.serde.dumps_typed(value)[1])
+
+    def record_checkpoint(self, checkpoint, new_versions):
+        values = checkpoint["channel_values"]
+        size = sum(self.size(values[ch]) for ch in new_versions if ch in values)
+        self.instrumentation.checkpoint_bytes.observe(size, graph=self.instrumentation.graph, kind="checkpoint")
+
+    def record_writes(self, writes):
+        size = sum(self.size(value) for _, value in writes)
+        self.instrumentation.checkpoint_bytes.observe(size, graph=self.instrumentation.graph, kind="writes")
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.record_checkpoint(checkpoint, new_versions)
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        self.record_checkpoint(checkpoint, new_versions)
+        return await self.saver.aput(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self.record_writes(writes)
+        return self.saver.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        self.record_writes(writes)
+        return await self.saver.aput_writes(config, writes, task_id, task_path)
+
+    def get_tuple(self, config):
+        return self.saver.get_tuple(config)
+
+    async def aget_tuple(self, config):
+        return await self.saver.aget_tuple(config)
+
+    def list(self, config, **kwargs):
+        return self.saver.list(config, **kwargs)
+
+    def alist(self, config, **kwargs):
+        return self.saver.alist(config, **kwargs)
+
+    def delete_thread(self, thread_id):
+        return self.saver.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id):
+        return await self.saver.adelete_thread(thread_id)
+
+### Attaching to a graph
+
+def instrument(graph, instrumentation: Optional[Instrumentation] = None, name: Optional[str] = None):
+    """ Copy of a compiled graph that reports to `instrumentation` (a new one named after the graph by default)
+
+    Returns (graph, instrumentation). If the graph has a checkpointer, writes are measured too.
+    """
+    instrumentation = instrumentation or Instrumentation(name or graph.name)
+    instrumented = graph.with_config(callbacks=[instrumentation])
+    if isinstance(graph.checkpointer, BaseCheckpointSaver):
+        instrumented = instrumented.copy({"checkpointer": InstrumentedSaver(graph.checkpointer, instrumentation)})
+    return instrumented, instrumentation
@@ -4,18 +4,30 @@ from typing_extensions import TypedDict
 
 from pydantic import BaseModel
 
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI 
 
 from langgraph.constants import Send
 from langgraph.graph import END, StateGraph, START
 
+from scheduler import ProviderRateLimiter, limited, provider_limited
+
+from http_clients import http_clients
+from llm_cache import response_cache
+
+from batching import MicroBatcher
+
+from structured import structured_output
+
+from reduce import ahierarchical_reduce, hierarchical_reduce, reduce_settings
+
 # Prompts we will use
 subjects_prompt = """Generate a list of 3 sub-topics that are all related to this overall topic: {topic}."""
 joke_prompt = """Generate a joke about {subject}"""
 best_joke_prompt = """Below are a bunch of jokes about {topic}. Select the best one! Return the ID of the best one, starting 0 as the ID for the first joke. Jokes: \n\n  {jokes}"""
 
-# LLM
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+# LLM: each request holds an "openai" limiter slot and spends its rate (LIMITER_OPENAI_*)
+model = provider_limited(ChatOpenAI(model="gpt-4o", temperature=0, cache=response_cache, rate_limiter=ProviderRateLimiter("openai"), http_client=http_clients.client, http_async_client=http_clients.async_client), "openai")
 
 # Define the state
 class Subjects(BaseModel):
@@ -32,7 +44,7 @@ class OverallState(TypedDict):
 
 def generate_topics(state: OverallState):
     prompt = subjects_prompt.format(topic=state["topic"])
-    response = model.with_structured_output(Subjects).invoke(prompt)
+    response = structured_output(model, Subjects).invoke(prompt)
     return {"subjects": response.subjects}
 
 class JokeState(TypedDict):
@@ -41,16 +53,56 @@ class JokeState(TypedDict):
 class Joke(BaseModel):
     joke: str
 
-def generate_joke(state: JokeState):
+# Batched map mode: {"configurable": {"map_mode": "batch", "batch_size": 16, "batch_wait": 0.02}}
+# sends the joke branches' calls through model.batch, up to batch_size at a time. A branch waits
+# at most batch_wait seconds for others to join. Each branch still takes its graph limiter slot
+# first, so LIMITER_MAP_REDUCE_CONCURRENCY, when set, caps the batch size.
+# With ChatOpenAI this is a no-op for request count: its batch sends one request per item, so the
+# mode only adds batch_wait of latency. It pays off only when `model` is swapped for one whose
+# batch is a single provider request (see batching.py).
+joke_model = structured_output(model, Joke)
+joke_batcher = MicroBatcher(joke_model)
+
+def generate_joke(state: JokeState, config: RunnableConfig):
     prompt = joke_prompt.format(subject=state["subject"])
-    response = model.with_structured_output(Joke).invoke(prompt)
+    configurable = config.get("configurable", {})
+    if configurable.get("map_mode") == "batch":
+        response = joke_batcher.invoke(prompt, config, configurable.get("batch_size"), configurable.get("batch_wait"))
+    else:
+        response = joke_model.invoke(prompt)
     return {"jokes": [response.joke]}
 
-def best_joke(state: OverallState):
-    jokes = "\n\n".join(state["jokes"])
-    prompt = best_joke_prompt.format(topic=state["topic"], jokes=jokes)
-    response = model.with_structured_output(BestJoke).invoke(prompt)
-    return {"best_selected_joke": state["jokes"][response.id]}
+async def agenerate_joke(state: JokeState, config: RunnableConfig):
+    prompt = joke_prompt.format(subject=state["subject"])
+    configurable = config.get("configurable", {})
+    if configurable.get("map_mode") == "batch":
+        response = await joke_batcher.ainvoke(prompt, config, configurable.get("batch_size"), configurable.get("batch_wait"))
+    else:
+        response = await joke_model.ainvoke(prompt)
+    return {"jokes": [response.joke]}
+
+def pick_best_joke(topic: str, jokes: list) -> str:
+    prompt = best_joke_prompt.format(topic=topic, jokes="\n\n".join(jokes))
+    response = structured_output(model, BestJoke).invoke(prompt)
+    return jokes[response.id]
+
+async def apick_best_joke(topic: str, jokes: list) -> str:
+    prompt = best_joke_prompt.format(topic=topic, jokes="\n\n".join(jokes))
+    response = await structured_output(model, BestJoke).ainvoke(prompt)
+    return jokes[response.id]
+
+# Tournament: past reduce_fan_in jokes (default 10), groups of jokes pick their winners in
+# parallel and the winners go on to the next round, so no prompt holds more than reduce_fan_in
+# jokes. reduce_max_depth caps the rounds before the final pick.
+def best_joke(state: OverallState, config: RunnableConfig):
+    fan_in, max_depth = reduce_settings(config, fan_in=10)
+    finalists = hierarchical_reduce(state["jokes"], lambda jokes: pick_best_joke(state["topic"], jokes), fan_in, max_depth, config)
+    return {"best_selected_joke": pick_best_joke(state["topic"], finalists)}
+
+async def abest_joke(state: OverallState, config: RunnableConfig):
+    fan_in, max_depth = reduce_settings(config, fan_in=10)
+    finalists = await ahierarchical_reduce(state["jokes"], lambda jokes: apick_best_joke(state["topic"], jokes), fan_in, max_depth, config)
+    return {"best_selected_joke": await apick_best_joke(state["topic"], finalists)}
 
 def continue_to_jokes(state: OverallState):
     return [Send("generate_joke", {"subject": s}) for s in state["subjects"]]
@@ -58,8 +110,10 @@ def continue_to_jokes(state: OverallState):
 # Construct the graph: here we put everything together to construct our graph
 graph_builder = StateGraph(OverallState)
 graph_builder.add_node("generate_topics", generate_topics)
-graph_builder.add_node("generate_joke", generate_joke)
-graph_builder.add_node("best_joke", best_joke)
+# Each joke branch queues for a slot in the per-graph limiter; the model takes the provider
+# limiter's slot for each request it sends
+graph_builder.add_node("generate_joke", limited(RunnableLambda(generate_joke, afunc=agenerate_joke), "map_reduce"))
+graph_builder.add_node("best_joke", RunnableLambda(best_joke, afunc=abest_joke))
 graph_builder.add_edge(START, "generate_topics")
 graph_builder.add_conditional_edges("generate_topics", continue_to_jokes, ["generate_joke"])
 graph_builder.add_edge("generate_joke", "best_joke")
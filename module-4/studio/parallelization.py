@@ -5,14 +5,16 @@ from typing_extensions import TypedDict
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_community.tools.tavily_search import TavilySearchResults
-
 from langchain_openai import ChatOpenAI
 
 from langgraph.graph import StateGraph, START, END
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
+from http_clients import http_clients
+from llm_cache import response_cache
+from retrieval import web_search, wikipedia_search
+from scheduler import ProviderRateLimiter, provider_limited
+
+llm = provider_limited(ChatOpenAI(model="gpt-4o", temperature=0, cache=response_cache, rate_limiter=ProviderRateLimiter("openai"), http_client=http_clients.client, http_async_client=http_clients.async_client), "openai")
 
 class State(TypedDict):
     question: str
@@ -24,8 +26,7 @@ def search_web(state):
     """ Retrieve docs from web search """
 
     # Search
-    tavily_search = TavilySearchResults(max_results=3)
-    search_docs = tavily_search.invoke(state['question'])
+    search_docs = web_search.get(state['question'])
 
      # Format
     formatted_search_docs = "\n\n---\n\n".join(
@@ -42,8 +43,7 @@ def search_wikipedia(state):
     """ Retrieve docs from wikipedia """
 
     # Search
-    search_docs = WikipediaLoader(query=state['question'], 
-                                  load_max_docs=2).load()
+    search_docs = wikipedia_search.get(state['question'])
 
      # Format
     formatted_search_docs = "\n\n---\n\n".join(
@@ -0,0 +1,58 @@
+import math
+from typing import Awaitable, Callable, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_executor_for_config
+from langchain_core.runnables.utils import gather_with_concurrency
+
+### Hierarchical reduce
+#
+# A reduce step that puts every item in one prompt stops working once the items outgrow the
+# context window, and gets slower as the list grows. hierarchical_reduce instead splits the
+# items into groups of at most `fan_in`, combines every group in parallel (pick a winner,
+# merge memos, ...), and repeats on the results until at most `fan_in` are left for the
+# caller's final call. Each prompt holds at most `fan_in` items, and the levels add
+# log(n) / log(fan_in) round trips instead of growing the one prompt.
+#
+# `max_depth` caps the number of levels; whatever is left then goes to the final call.
+# Both come from the reduce_fan_in / reduce_max_depth configurable keys via reduce_settings.
+
+def reduce_settings(config: RunnableConfig, fan_in: int = 8, max_depth: Optional[int] = None) -> tuple:
+    """ (fan_in, max_depth) from the reduce_fan_in and reduce_max_depth configurable keys """
+    configurable = config.get("configurable", {})
+    max_depth = configurable.get("reduce_max_depth", max_depth)
+    return max(2, int(configurable.get("reduce_fan_in", fan_in))), None if max_depth is None else int(max_depth)
+
+def groups(items: list, fan_in: int) -> List[list]:
+    """ Split into the fewest groups of at most fan_in items, sized as evenly as possible """
+    count = math.ceil(len(items) / fan_in)
+    size, extra = divmod(len(items), count)
+    grouped, start = [], 0
+    for index in range(count):
+        end = start + size + (index < extra)
+        grouped.append(items[start:end])
+        start = end
+    return grouped
+
+def hierarchical_reduce(items: list, combine: Callable[[list], object], fan_in: int = 8,
+                        max_depth: Optional[int] = None, config: Optional[RunnableConfig] = None) -> list:
+    """ Combine groups of items level by level, in parallel, until at most fan_in are left """
+    items, depth = list(items), 0
+    while len(items) > fan_in and (max_depth is None or depth < max_depth):
+        # A single leftover item goes through as it is
+        with get_executor_for_config(config or {}) as executor:
+            items = list(executor.map(lambda group: group[0] if len(group) == 1 else combine(group), groups(items, fan_in)))
+        depth += 1
+    return items
+
+async def ahierarchical_reduce(items: list, combine: Callable[[list], Awaitable[object]], fan_in: int = 8,
+                               max_depth: Optional[int] = None, config: Optional[RunnableConfig] = None) -> list:
+    """ hierarchical_reduce with an async combine; at most config["max_concurrency"] groups are combined at once """
+    async def run(group: list):
+        return group[0] if len(group) == 1 else await combine(group)
+
+    items, depth = list(items), 0
+    while len(items) > fan_in and (max_depth is None or depth < max_depth):
+        items = await gather_with_concurrency((config or {}).get("max_concurrency"), *(run(group) for group in groups(items, fan_in)))
+        depth += 1
+    return items
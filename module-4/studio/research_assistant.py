@@ -1,19 +1,26 @@
 import operator
 from pydantic import BaseModel, Field
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 from typing_extensions import TypedDict
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.messages import HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 
 from langgraph.constants import Send
 from langgraph.graph import END, MessagesState, START, StateGraph
 
+from context_builder import build_context
+from http_clients import http_clients
+from llm_cache import response_cache
+from reduce import ahierarchical_reduce, hierarchical_reduce, reduce_settings
+from retrieval import web_search, wikipedia_search
+from scheduler import ProviderRateLimiter, limited, provider_limited
+from structured import structured_output
+
 ### LLM
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
+llm = provider_limited(ChatOpenAI(model="gpt-4o", temperature=0, cache=response_cache, rate_limiter=ProviderRateLimiter("openai"), http_client=http_clients.client, http_async_client=http_clients.async_client), "openai")
 
 ### Schema 
 
@@ -49,6 +56,8 @@ class InterviewState(MessagesState):
     max_num_turns: int # Number turns of conversation
     context: Annotated[list, operator.add] # Source docs
     analyst: Analyst # Analyst asking questions
+    expert_turns: Annotated[int, operator.add] # Number of expert answers so far
+    interview_ended: bool # Whether the last question closed the interview
     interview: str # Interview transcript
     sections: list # Final key we duplicate in outer state for Send() API
 
@@ -61,6 +70,7 @@ class ResearchGraphState(TypedDict):
     human_analyst_feedback: str # Human feedback
     analysts: List[Analyst] # Analyst asking questions
     sections: Annotated[list, operator.add] # Send() API key
+    memos: Optional[list] # Sections merged for the writers, None when they use the sections as they are
     introduction: str # Introduction for the final report
     content: str # Content for the final report
     conclusion: str # Conclusion for the final report
@@ -92,7 +102,7 @@ def create_analysts(state: GenerateAnalystsState):
     human_analyst_feedback=state.get('human_analyst_feedback', '')
         
     # Enforce structured output
-    structured_llm = llm.with_structured_output(Perspectives)
+    structured_llm = structured_output(llm, Perspectives)
 
     # System message
     system_message = analyst_instructions.format(topic=topic,
@@ -105,6 +115,28 @@ def create_analysts(state: GenerateAnalystsState):
     # Write the list of analysis to state
     return {"analysts": analysts.analysts}
 
+async def acreate_analysts(state: GenerateAnalystsState):
+    
+    """ Create analysts (async) """
+    
+    topic=state['topic']
+    max_analysts=state['max_analysts']
+    human_analyst_feedback=state.get('human_analyst_feedback', '')
+        
+    # Enforce structured output
+    structured_llm = structured_output(llm, Perspectives)
+
+    # System message
+    system_message = analyst_instructions.format(topic=topic,
+                                                            human_analyst_feedback=human_analyst_feedback, 
+                                                            max_analysts=max_analysts)
+
+    # Generate question 
+    analysts = await structured_llm.ainvoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")])
+    
+    # Write the list of analysis to state
+    return {"analysts": analysts.analysts}
+
 def human_feedback(state: GenerateAnalystsState):
     """ No-op node that should be interrupted on """
     pass
@@ -140,8 +172,23 @@ def generate_question(state: InterviewState):
     system_message = question_instructions.format(goals=analyst.persona)
     question = llm.invoke([SystemMessage(content=system_message)]+messages)
         
-    # Write messages to state
-    return {"messages": [question]}
+    # Write messages to state, noting if the question signals the end of discussion
+    return {"messages": [question], "interview_ended": "Thank you so much for your help" in question.content}
+
+async def agenerate_question(state: InterviewState):
+
+    """ Node to generate a question (async) """
+
+    # Get state
+    analyst = state["analyst"]
+    messages = state["messages"]
+
+    # Generate question 
+    system_message = question_instructions.format(goals=analyst.persona)
+    question = await llm.ainvoke([SystemMessage(content=system_message)]+messages)
+        
+    # Write messages to state, noting if the question signals the end of discussion
+    return {"messages": [question], "interview_ended": "Thank you so much for your help" in question.content}
 
 # Search query writing
 search_instructions = SystemMessage(content=f"""You will be given a conversation between an analyst and an expert. 
@@ -154,51 +201,79 @@ Pay particular attention to the final question posed by the analyst.
 
 Convert this final question into a well-structured web search query""")
 
+def format_web_docs(search_docs):
+
+    """ Format Tavily results as source documents """
+
+    return "\n\n---\n\n".join(
+        [
+            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
+            for doc in search_docs
+        ]
+    )
+
+def format_wiki_docs(search_docs):
+
+    """ Format Wikipedia pages as source documents """
+
+    return "\n\n---\n\n".join(
+        [
+            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
+            for doc in search_docs
+        ]
+    )
+
 def search_web(state: InterviewState):
     
     """ Retrieve docs from web search """
 
-    # Search
-    tavily_search = TavilySearchResults(max_results=3)
-
     # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
+    structured_llm = structured_output(llm, SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
     
     # Search
-    search_docs = tavily_search.invoke(search_query.search_query)
+    search_docs = web_search.get(search_query.search_query)
 
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    return {"context": [format_web_docs(search_docs)]} 
+
+async def asearch_web(state: InterviewState):
+    
+    """ Retrieve docs from web search (async) """
 
-    return {"context": [formatted_search_docs]} 
+    # Search query
+    structured_llm = structured_output(llm, SearchQuery)
+    search_query = await structured_llm.ainvoke([search_instructions]+state['messages'])
+    
+    # Search
+    search_docs = await web_search.aget(search_query.search_query)
+
+    return {"context": [format_web_docs(search_docs)]} 
 
 def search_wikipedia(state: InterviewState):
     
     """ Retrieve docs from wikipedia """
 
     # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
+    structured_llm = structured_output(llm, SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
     
     # Search
-    search_docs = WikipediaLoader(query=search_query.search_query, 
-                                  load_max_docs=2).load()
+    search_docs = wikipedia_search.get(search_query.search_query)
 
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    return {"context": [format_wiki_docs(search_docs)]} 
 
-    return {"context": [formatted_search_docs]} 
+async def asearch_wikipedia(state: InterviewState):
+    
+    """ Retrieve docs from wikipedia (async) """
+
+    # Search query
+    structured_llm = structured_output(llm, SearchQuery)
+    search_query = await structured_llm.ainvoke([search_instructions]+state['messages'])
+    
+    # Search
+    search_docs = await wikipedia_search.aget(search_query.search_query)
+
+    return {"context": [format_wiki_docs(search_docs)]} 
 
 # Generate expert answer
 answer_instructions = """You are an expert being interviewed by an analyst.
@@ -229,14 +304,17 @@ When answering questions, follow these guidelines:
         
 And skip the addition of the brackets as well as the Document source preamble in your citation."""
 
-def generate_answer(state: InterviewState):
+def generate_answer(state: InterviewState, config: RunnableConfig):
     
     """ Node to answer a question """
 
     # Get state
     analyst = state["analyst"]
     messages = state["messages"]
-    context = state["context"]
+
+    # Pack the unique sources most relevant to the question into the token budget
+    budget = config.get("configurable", {}).get("answer_context_tokens", 4000)
+    context = build_context(state["context"], messages[-1].content, budget).text
 
     # Answer question
     system_message = answer_instructions.format(goals=analyst.persona, context=context)
@@ -245,8 +323,30 @@ def generate_answer(state: InterviewState):
     # Name the message as coming from the expert
     answer.name = "expert"
     
-    # Append it to state
-    return {"messages": [answer]}
+    # Append it to state and count the turn
+    return {"messages": [answer], "expert_turns": 1}
+
+async def agenerate_answer(state: InterviewState, config: RunnableConfig):
+    
+    """ Node to answer a question (async) """
+
+    # Get state
+    analyst = state["analyst"]
+    messages = state["messages"]
+
+    # Pack the unique sources most relevant to the question into the token budget
+    budget = config.get("configurable", {}).get("answer_context_tokens", 4000)
+    context = build_context(state["context"], messages[-1].content, budget).text
+
+    # Answer question
+    system_message = answer_instructions.format(goals=analyst.persona, context=context)
+    answer = await llm.ainvoke([SystemMessage(content=system_message)]+messages)
+            
+    # Name the message as coming from the expert
+    answer.name = "expert"
+    
+    # Append it to state and count the turn
+    return {"messages": [answer], "expert_turns": 1}
 
 def save_interview(state: InterviewState):
     
@@ -261,29 +361,19 @@ def save_interview(state: InterviewState):
     # Save to interviews key
     return {"interview": interview}
 
-def route_messages(state: InterviewState, 
-                   name: str = "expert"):
+def route_messages(state: InterviewState):
 
     """ Route between question and answer """
     
-    # Get messages
-    messages = state["messages"]
     max_num_turns = state.get('max_num_turns',2)
 
-    # Check the number of expert answers 
-    num_responses = len(
-        [m for m in messages if isinstance(m, AIMessage) and m.name == name]
-    )
-
     # End if expert has answered more than the max turns
-    if num_responses >= max_num_turns:
+    if state.get('expert_turns', 0) >= max_num_turns:
         return 'save_interview'
 
     # This router is run after each question - answer pair 
-    # Get the last question asked to check if it signals the end of discussion
-    last_question = messages[-2]
-    
-    if "Thank you so much for your help" in last_question.content:
+    # End if the last question signaled the end of discussion
+    if state.get('interview_ended', False):
         return 'save_interview'
     return "ask_question"
 
@@ -339,14 +429,17 @@ There should be no redundant sources. It should simply be:
 - Include no preamble before the title of the report
 - Check that all guidelines have been followed"""
 
-def write_section(state: InterviewState):
+def write_section(state: InterviewState, config: RunnableConfig):
 
     """ Node to write a section """
 
     # Get state
     interview = state["interview"]
-    context = state["context"]
     analyst = state["analyst"]
+
+    # Pack the unique sources most relevant to the analyst's focus into the token budget
+    budget = config.get("configurable", {}).get("section_context_tokens", 8000)
+    context = build_context(state["context"], analyst.description, budget).text
    
     # Write section using either the gathered source docs from interview (context) or the interview itself (interview)
     system_message = section_writer_instructions.format(focus=analyst.description)
@@ -355,24 +448,52 @@ def write_section(state: InterviewState):
     # Append it to state
     return {"sections": [section.content]}
 
-# Add nodes and edges 
-interview_builder = StateGraph(InterviewState)
-interview_builder.add_node("ask_question", generate_question)
-interview_builder.add_node("search_web", search_web)
-interview_builder.add_node("search_wikipedia", search_wikipedia)
-interview_builder.add_node("answer_question", generate_answer)
-interview_builder.add_node("save_interview", save_interview)
-interview_builder.add_node("write_section", write_section)
-
-# Flow
-interview_builder.add_edge(START, "ask_question")
-interview_builder.add_edge("ask_question", "search_web")
-interview_builder.add_edge("ask_question", "search_wikipedia")
-interview_builder.add_edge("search_web", "answer_question")
-interview_builder.add_edge("search_wikipedia", "answer_question")
-interview_builder.add_conditional_edges("answer_question", route_messages,['ask_question','save_interview'])
-interview_builder.add_edge("save_interview", "write_section")
-interview_builder.add_edge("write_section", END)
+async def awrite_section(state: InterviewState, config: RunnableConfig):
+
+    """ Node to write a section (async) """
+
+    # Get state
+    analyst = state["analyst"]
+
+    # Pack the unique sources most relevant to the analyst's focus into the token budget
+    budget = config.get("configurable", {}).get("section_context_tokens", 8000)
+    context = build_context(state["context"], analyst.description, budget).text
+   
+    # Write section using the gathered source docs from interview (context)
+    system_message = section_writer_instructions.format(focus=analyst.description)
+    section = await llm.ainvoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
+                
+    # Append it to state
+    return {"sections": [section.content]}
+
+def build_interview_graph(ask_question, search_web, search_wikipedia, answer_question, write_section):
+
+    """ Wire the interview sub-graph from either the sync or the async nodes """
+
+    # Add nodes and edges 
+    interview_builder = StateGraph(InterviewState)
+    interview_builder.add_node("ask_question", ask_question)
+    interview_builder.add_node("search_web", search_web)
+    interview_builder.add_node("search_wikipedia", search_wikipedia)
+    interview_builder.add_node("answer_question", answer_question)
+    interview_builder.add_node("save_interview", save_interview)
+    interview_builder.add_node("write_section", write_section)
+
+    # Flow
+    interview_builder.add_edge(START, "ask_question")
+    interview_builder.add_edge("ask_question", "search_web")
+    interview_builder.add_edge("ask_question", "search_wikipedia")
+    interview_builder.add_edge("search_web", "answer_question")
+    interview_builder.add_edge("search_wikipedia", "answer_question")
+    interview_builder.add_conditional_edges("answer_question", route_messages,['ask_question','save_interview'])
+    interview_builder.add_edge("save_interview", "write_section")
+    interview_builder.add_edge("write_section", END)
+    return interview_builder
+
+interview_builder = build_interview_graph(generate_question, search_web, search_wikipedia, generate_answer, write_section)
+
+# Async build: every network call awaits, so the interviews fanned out by Send() share one event loop
+async_interview_builder = build_interview_graph(agenerate_question, asearch_web, asearch_wikipedia, agenerate_answer, awrite_section)
 
 def initiate_all_interviews(state: ResearchGraphState):
 
@@ -428,22 +549,6 @@ Here are the memos from your analysts to build your report from:
 
 {context}"""
 
-def write_report(state: ResearchGraphState):
-
-    """ Node to write the final report body """
-
-    # Full set of sections
-    sections = state["sections"]
-    topic = state["topic"]
-
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-    
-    # Summarize the sections into a final report
-    system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
-    report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")]) 
-    return {"content": report.content}
-
 # Write the introduction or conclusion
 intro_conclusion_instructions = """You are a technical writer finishing a report on {topic}
 
@@ -467,40 +572,192 @@ For your conclusion, use ## Conclusion as the section header.
 
 Here are the sections to reflect on for writing: {formatted_str_sections}"""
 
-def write_introduction(state: ResearchGraphState):
+# Write all three parts at once
+combined_writer_instructions = """You are a technical writer creating a report on this overall topic: 
 
-    """ Node to write the introduction """
+{topic}
+
+You have a team of analysts. Each analyst conducted an interview with an expert on a specific sub-topic and wrote up their findings into a memo.
+
+Write three parts of the report from these memos:
+
+1. introduction: Target around 100 words, crisply previewing all of the sections of the report. Create a compelling title and use the # header for the title, then use ## Introduction as the section header.
+
+2. content: Consolidate the insights from the memos into a crisp overall summary that ties together their central ideas as a cohesive single narrative. Start with a single title header: ## Insights. Use no sub-heading and do not mention any analyst names. Preserve any citations in the memos, which will be annotated in brackets, for example [1] or [2]. End with a consolidated list of sources, in order and not repeated, under a ## Sources header.
+
+3. conclusion: Target around 100 words, crisply recapping all of the sections of the report. Use ## Conclusion as the section header.
+
+Use markdown formatting and include no pre-amble in any part.
 
-    # Full set of sections
-    sections = state["sections"]
+Here are the memos from your analysts to build your report from: 
+
+{context}"""
+
+# With the shared prefix layout the memos come first and are identical in all three writer prompts,
+# so the provider can serve the repeated prefix from its prompt cache
+memos_prefix_instructions = """You are a technical writer creating a report on this overall topic: {topic}
+
+Here are the memos from your analysts, which are the sections of the report:
+
+{context}"""
+
+class ReportParts(BaseModel):
+    introduction: str = Field(
+        description="Introduction, with a # title and a ## Introduction header.",
+    )
+    content: str = Field(
+        description="Report body, starting with ## Insights and ending with a ## Sources section.",
+    )
+    conclusion: str = Field(
+        description="Conclusion, with a ## Conclusion header.",
+    )
+
+def writer_mode(config: RunnableConfig) -> str:
+
+    """ How the final report is written: "separate" (three calls, default), "shared_prefix" (three calls sharing a cacheable prefix) or "combined" (one call) """
+
+    return config.get("configurable", {}).get("writer_mode", "separate")
+
+def writer_messages(state: ResearchGraphState, config: RunnableConfig, part: str):
+
+    """ Prompt for write_report ("report"), write_introduction ("introduction") or write_conclusion ("conclusion") """
+
+    # Full set of sections, or the merged memos
+    sections = state.get("memos") or state["sections"]
     topic = state["topic"]
 
     # Concat all sections together
     formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-    
-    # Summarize the sections into a final report
-    
-    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-    intro = llm.invoke([instructions]+[HumanMessage(content=f"Write the report introduction")]) 
+
+    if part == "report":
+        instructions, task = report_writer_instructions, "Write a report based upon these memos."
+    else:
+        instructions, task = intro_conclusion_instructions, f"Write the report {part}"
+
+    if writer_mode(config) == "shared_prefix":
+        prefix = memos_prefix_instructions.format(topic=topic, context=formatted_str_sections)
+        instructions = instructions.format(topic=topic, context="(the memos above)", formatted_str_sections="(the memos above)")
+        return [SystemMessage(content=prefix)]+[HumanMessage(content=f"{instructions}\n\n{task}")]
+
+    if part == "report":
+        system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)
+        return [SystemMessage(content=system_message)]+[HumanMessage(content=task)]
+    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)
+    return [instructions]+[HumanMessage(content=task)]
+
+def route_writers(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Conditional edge to write the report with three parallel calls or with one combined call """
+
+    if writer_mode(config) == "combined":
+        return "write_combined"
+    return ["write_report", "write_introduction", "write_conclusion"]
+
+# With dozens of sections, merge_memos first merges them in parallel groups of reduce_fan_in (default 10),
+# level by level, so every writer gets the same at most reduce_fan_in memos in its prompt
+merge_memos_instructions = """You are a technical writer consolidating memos on this overall topic: {topic}
+
+Merge the memos below into a single memo that keeps every central insight.
+
+1. Use markdown formatting and include no pre-amble.
+2. Do not mention any analyst names.
+3. Preserve any citations, annotated in brackets, for example [1] or [2]; renumber them so each source has one number.
+4. End with a consolidated list of sources, in order and not repeated, under a ## Sources header.
+
+Here are the memos to merge:
+
+{context}"""
+
+def merge_memos_messages(topic: str, memos: list):
+
+    """ Prompt to merge a group of memos into one """
+
+    system_message = merge_memos_instructions.format(topic=topic, context="\n\n".join(memos))
+    return [SystemMessage(content=system_message)]+[HumanMessage(content="Merge these memos.")]
+
+def merge_memos(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to merge the sections into at most reduce_fan_in memos for the writers """
+
+    fan_in, max_depth = reduce_settings(config, fan_in=10)
+    merge = lambda memos: llm.invoke(merge_memos_messages(state["topic"], memos)).content
+    memos = hierarchical_reduce(state["sections"], merge, fan_in, max_depth, config)
+    return {"memos": memos if len(memos) < len(state["sections"]) else None}
+
+async def amerge_memos(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to merge the sections into at most reduce_fan_in memos for the writers (async) """
+
+    fan_in, max_depth = reduce_settings(config, fan_in=10)
+    async def merge(memos):
+        return (await llm.ainvoke(merge_memos_messages(state["topic"], memos))).content
+    memos = await ahierarchical_reduce(state["sections"], merge, fan_in, max_depth, config)
+    return {"memos": memos if len(memos) < len(state["sections"]) else None}
+
+def write_report(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to write the final report body """
+
+    report = llm.invoke(writer_messages(state, config, "report")) 
+    return {"content": report.content}
+
+async def awrite_report(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to write the final report body (async) """
+
+    report = await llm.ainvoke(writer_messages(state, config, "report")) 
+    return {"content": report.content}
+
+def write_introduction(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to write the introduction """
+
+    intro = llm.invoke(writer_messages(state, config, "introduction")) 
     return {"introduction": intro.content}
 
-def write_conclusion(state: ResearchGraphState):
+async def awrite_introduction(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to write the introduction (async) """
+
+    intro = await llm.ainvoke(writer_messages(state, config, "introduction")) 
+    return {"introduction": intro.content}
+
+def write_conclusion(state: ResearchGraphState, config: RunnableConfig):
 
     """ Node to write the conclusion """
 
-    # Full set of sections
-    sections = state["sections"]
-    topic = state["topic"]
+    conclusion = llm.invoke(writer_messages(state, config, "conclusion")) 
+    return {"conclusion": conclusion.content}
 
-    # Concat all sections together
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-    
-    # Summarize the sections into a final report
-    
-    instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-    conclusion = llm.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")]) 
+async def awrite_conclusion(state: ResearchGraphState, config: RunnableConfig):
+
+    """ Node to write the conclusion (async) """
+
+    conclusion = await llm.ainvoke(writer_messages(state, config, "conclusion")) 
     return {"conclusion": conclusion.content}
 
+def combined_writer_messages(state: ResearchGraphState):
+
+    """ Prompt for write_combined """
+
+    formatted_str_sections = "\n\n".join([f"{section}" for section in state.get("memos") or state["sections"]])
+    system_message = combined_writer_instructions.format(topic=state["topic"], context=formatted_str_sections)
+    return [SystemMessage(content=system_message)]+[HumanMessage(content="Write the introduction, report and conclusion.")]
+
+def write_combined(state: ResearchGraphState):
+
+    """ Node to write the introduction, report body and conclusion in one call """
+
+    parts = structured_output(llm, ReportParts).invoke(combined_writer_messages(state))
+    return {"introduction": parts.introduction, "content": parts.content, "conclusion": parts.conclusion}
+
+async def awrite_combined(state: ResearchGraphState):
+
+    """ Node to write the introduction, report body and conclusion in one call (async) """
+
+    parts = await structured_output(llm, ReportParts).ainvoke(combined_writer_messages(state))
+    return {"introduction": parts.introduction, "content": parts.content, "conclusion": parts.conclusion}
+
 def finalize_report(state: ResearchGraphState):
 
     """ The is the "reduce" step where we gather all the sections, combine them, and reflect on them to write the intro/conclusion """
@@ -522,25 +779,140 @@ def finalize_report(state: ResearchGraphState):
         final_report += "\n\n## Sources\n" + sources
     return {"final_report": final_report}
 
-# Add nodes and edges 
-builder = StateGraph(ResearchGraphState)
-builder.add_node("create_analysts", create_analysts)
-builder.add_node("human_feedback", human_feedback)
-builder.add_node("conduct_interview", interview_builder.compile())
-builder.add_node("write_report",write_report)
-builder.add_node("write_introduction",write_introduction)
-builder.add_node("write_conclusion",write_conclusion)
-builder.add_node("finalize_report",finalize_report)
-
-# Logic
-builder.add_edge(START, "create_analysts")
-builder.add_edge("create_analysts", "human_feedback")
-builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
-builder.add_edge("conduct_interview", "write_report")
-builder.add_edge("conduct_interview", "write_introduction")
-builder.add_edge("conduct_interview", "write_conclusion")
-builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
-builder.add_edge("finalize_report", END)
+class ReportAssembler:
+
+    """ Assemble the final report in section order while the three writers stream in parallel
+
+    Lays the report out like finalize_report: introduction, report body (without its
+    "## Insights" header), conclusion, then the body's sources. Each call returns the
+    text that can be emitted now; later parts are buffered until the earlier ones finish.
+    """
+
+    parts = ["write_introduction", "write_report", "write_conclusion"]
+    sources_marker = "\n## Sources\n"
+
+    def __init__(self):
+        self.buffers = {part: "" for part in self.parts}
+        self.done = set()
+        self.current = 0 # Index of the part being emitted
+        self.emitted = 0 # Characters of the current part already emitted
+        self.sources = None
+
+    def add(self, part: str, text: str) -> str:
+        """ Add streamed tokens for a part """
+        self.buffers[part] += text
+        return self.flush()
+
+    def finish(self, part: str, text: str) -> str:
+        """ Mark a part complete with its final text (which may never have been streamed, e.g. on a cache hit) """
+        self.buffers[part] = text
+        self.done.add(part)
+        return self.flush()
+
+    def visible(self, part: str) -> str:
+        """ Text of a part that is safe to emit """
+        text = self.buffers[part]
+        if part != "write_report":
+            return text
+        done = part in self.done
+        # Drop the "## Insights" header once we can tell whether it is there
+        if text.startswith("## Insights"):
+            text = text[len("## Insights"):]
+        elif not done and "## Insights".startswith(text):
+            return ""
+        # Hold sources back for the end of the report
+        if self.sources_marker in text:
+            text, sources = text.split(self.sources_marker, 1)
+            if done:
+                self.sources = sources
+            return text
+        if not done:
+            # A partial "## Sources" marker may be at the end of the buffer
+            return text[:max(0, len(text) - len(self.sources_marker) + 1)]
+        return text
+
+    def flush(self) -> str:
+        out = ""
+        while self.current < len(self.parts):
+            part = self.parts[self.current]
+            text = self.visible(part)
+            out += text[self.emitted:]
+            self.emitted = len(text)
+            if part not in self.done:
+                break
+            self.current += 1
+            self.emitted = 0
+            if self.current < len(self.parts):
+                out += "\n\n---\n\n"
+            elif self.sources is not None:
+                out += "\n\n## Sources\n" + self.sources
+        return out
+
+async def astream_report(graph, input, config=None):
+
+    """ Stream the final report as it is written, in section order
+
+    Use with async_graph, e.g. to resume after human feedback: astream_report(async_graph, None, thread).
+    Tokens from write_introduction are emitted as soon as they arrive; the body and conclusion follow.
+    """
+
+    assembler = ReportAssembler()
+    final_keys = {"write_introduction": "introduction", "write_report": "content", "write_conclusion": "conclusion"}
+    async for mode, event in graph.astream(input, config, stream_mode=["messages", "updates"]):
+        piece = ""
+        if mode == "messages":
+            chunk, metadata = event
+            part = metadata.get("langgraph_node")
+            if part in final_keys and isinstance(chunk.content, str) and chunk.content:
+                piece = assembler.add(part, chunk.content)
+        else:
+            for part, update in event.items():
+                if part in final_keys:
+                    piece += assembler.finish(part, update[final_keys[part]])
+                elif part == "write_combined":
+                    # One structured-output call wrote all three parts
+                    for writer, key in final_keys.items():
+                        piece += assembler.finish(writer, update[key])
+        if piece:
+            yield piece
+
+def build_research_graph(create_analysts, conduct_interview, merge_memos, write_report, write_introduction, write_conclusion, write_combined):
+
+    """ Wire the research graph from either the sync or the async nodes """
+
+    # Add nodes and edges 
+    builder = StateGraph(ResearchGraphState)
+    builder.add_node("create_analysts", create_analysts)
+    builder.add_node("human_feedback", human_feedback)
+    builder.add_node("conduct_interview", conduct_interview)
+    builder.add_node("merge_memos", merge_memos)
+    builder.add_node("write_report",write_report)
+    builder.add_node("write_introduction",write_introduction)
+    builder.add_node("write_conclusion",write_conclusion)
+    builder.add_node("write_combined",write_combined)
+    builder.add_node("finalize_report",finalize_report)
+
+    # Logic
+    builder.add_edge(START, "create_analysts")
+    builder.add_edge("create_analysts", "human_feedback")
+    builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
+    builder.add_edge("conduct_interview", "merge_memos")
+    builder.add_conditional_edges("merge_memos", route_writers, ["write_report", "write_introduction", "write_conclusion", "write_combined"])
+    builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
+    builder.add_edge("write_combined", "finalize_report")
+    builder.add_edge("finalize_report", END)
+    return builder
+
+# Interviews fanned out by Send() queue for a slot in the per-graph limiter; searches inside an
+# interview hold no provider slot, only the llm's requests do
+builder = build_research_graph(create_analysts, limited(interview_builder.compile(), "research_assistant"), merge_memos, write_report, write_introduction, write_conclusion, write_combined)
+
+# Async build, for graph.ainvoke / graph.astream
+async_builder = build_research_graph(acreate_analysts, limited(async_interview_builder.compile(), "research_assistant"), amerge_memos, awrite_report, awrite_introduction, awrite_conclusion, awrite_combined)
 
 # Compile
-graph = builder.compile(interrupt_before=['human_feedback'])
\ No newline at end of file
+# Outside of Studio, long interviews can checkpoint only what each step appends to messages / context:
+# builder.compile(checkpointer=DeltaCheckpointSaver(MemorySaver(), namespaces=("conduct_interview",)), ...)
+# (see delta_checkpoint.py)
+graph = builder.compile(interrupt_before=['human_feedback'])
+async_graph = async_builder.compile(interrupt_before=['human_feedback'])
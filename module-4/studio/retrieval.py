@@ -0,0 +1,214 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+from typing import Awaitable, Callable, Optional
+
+from langchain_community.document_loaders import WikipediaLoader
+from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
+
+from http_clients import http_clients
+
+### Search cache
+
+def normalize_query(query: str) -> str:
+    """ Queries differing only in case, spacing or trailing punctuation share a cache entry """
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").lower()
+
+class SearchCache:
+    """ Normalized-query cache with in-flight request coalescing and stale-while-revalidate
+
+    - A result younger than `ttl` is served from the cache.
+    - A result younger than `ttl + stale_ttl` is served immediately and refreshed in the background.
+    - Concurrent misses for the same query wait on a single fetch instead of issuing their own.
+    """
+
+    def __init__(self, fetch: Callable[[str], list], afetch: Callable[[str], Awaitable[list]],
+                 ttl: float = 600, stale_ttl: float = 0, max_entries: int = 512):
+        self.fetch = fetch
+        self.afetch = afetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        # Metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.tasks = set() # Background refreshes, kept alive until they finish
+
+    def _lookup(self, key: str):
+        """ Return (cached value or None, whether to refresh it, in-flight future to wait on or None, whether we lead the fetch) """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                age = time.time() - entry[0]
+                if age <= self.ttl:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return entry[1], False, None, False
+                if age <= self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    refresh = key not in self.in_flight
+                    if refresh:
+                        self.in_flight[key] = Future()
+                    return entry[1], refresh, None, False
+            if key in self.in_flight:
+                self.coalesced += 1
+                return None, False, self.in_flight[key], False
+            self.misses += 1
+            self.in_flight[key] = Future()
+            return None, False, self.in_flight[key], True
+
+    def _store(self, key: str, result=None, error: Optional[BaseException] = None):
+        with self.lock:
+            future = self.in_flight.pop(key)
+            if error is None:
+                self.entries[key] = (time.time(), result)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # The leader was cancelled or interrupted: waiters retry instead of inheriting that
+            future.cancel()
+
+    def _run(self, key: str, query: str):
+        try:
+            result = self.fetch(query)
+        except BaseException as error:
+            self._store(key, error=error)
+            raise
+        self._store(key, result)
+        return result
+
+    async def _arun(self, key: str, query: str):
+        try:
+            result = await self.afetch(query)
+        except BaseException as error:
+            self._store(key, error=error)
+            raise
+        self._store(key, result)
+        return result
+
+    def get(self, query: str) -> list:
+        key = normalize_query(query)
+        while True:
+            value, refresh, future, leader = self._lookup(key)
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, query), daemon=True).start()
+            if future is None:
+                return value
+            if leader:
+                return self._run(key, query)
+            try:
+                return future.result()
+            except CancelledError:
+                # The leader was cancelled: look up again, and lead the fetch if nobody else does
+                continue
+
+    async def aget(self, query: str) -> list:
+        key = normalize_query(query)
+        while True:
+            value, refresh, future, leader = self._lookup(key)
+            if refresh:
+                task = asyncio.get_running_loop().create_task(self._arefresh(key, query))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            if future is None:
+                return value
+            if leader:
+                return await self._arun(key, query)
+            try:
+                # Shielded: a waiter's own cancellation must not cancel the shared fetch
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                # Only the leader's cancellation is retried; our own propagates
+                if not future.cancelled():
+                    raise
+
+    def _refresh(self, key: str, query: str):
+        try:
+            self._run(key, query)
+        except Exception:
+            # Keep serving the stale entry; the next lookup retries
+            pass
+
+    async def _arefresh(self, key: str, query: str):
+        try:
+            await self._arun(key, query)
+        except Exception:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses, "coalesced": self.coalesced}
+
+### Clients
+
+class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """ Tavily API calls over the shared HTTP clients instead of a new connection per search """
+
+    def search_params(self, query: str, max_results: Optional[int] = 5, search_depth: Optional[str] = "advanced",
+                      include_domains: Optional[list] = None, exclude_domains: Optional[list] = None,
+                      include_answer: Optional[bool] = False, include_raw_content: Optional[bool] = False,
+                      include_images: Optional[bool] = False) -> dict:
+        """ The request body TavilySearchAPIWrapper sends """
+        return {"api_key": self.tavily_api_key.get_secret_value(), "query": query, "max_results": max_results,
+                "search_depth": search_depth, "include_domains": include_domains or [],
+                "exclude_domains": exclude_domains or [], "include_answer": include_answer,
+                "include_raw_content": include_raw_content, "include_images": include_images}
+
+    def raw_results(self, query: str, *args, **kwargs) -> dict:
+        response = http_clients.client.post(f"{TAVILY_API_URL}/search", json=self.search_params(query, *args, **kwargs))
+        response.raise_for_status()
+        return response.json()
+
+    async def raw_results_async(self, query: str, *args, **kwargs) -> dict:
+        response = await http_clients.async_client.post(f"{TAVILY_API_URL}/search", json=self.search_params(query, *args, **kwargs))
+        response.raise_for_status()
+        return response.json()
+
+# Tavily client, built once and shared by every search
+tavily_client = None
+
+def get_tavily_client():
+    global tavily_client
+    if tavily_client is None:
+        tavily_client = TavilySearchResults(max_results=3, api_wrapper=PooledTavilySearchAPIWrapper())
+    return tavily_client
+
+def web_results(result) -> list:
+    """ TavilySearchResults returns a failed search as the error's repr: raise it, so it's never cached """
+    if not isinstance(result, list):
+        raise RuntimeError(f"Tavily search failed: {result}")
+    return result
+
+def fetch_web(query: str) -> list:
+    return web_results(get_tavily_client().invoke(query))
+
+async def afetch_web(query: str) -> list:
+    return web_results(await get_tavily_client().ainvoke(query))
+
+def fetch_wikipedia(query: str) -> list:
+    return WikipediaLoader(query=query, load_max_docs=2).load()
+
+async def afetch_wikipedia(query: str) -> list:
+    return await WikipediaLoader(query=query, load_max_docs=2).aload()
+
+# Web results go stale quickly; Wikipedia pages are served stale for a day while they refresh
+web_search = SearchCache(fetch_web, afetch_web, ttl=600)
+wikipedia_search = SearchCache(fetch_wikipedia, afetch_wikipedia, ttl=3600, stale_ttl=86400)
@@ -0,0 +1,355 @@
+import asyncio
+import contextvars
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, ExitStack, AsyncExitStack
+from typing import Optional
+
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.language_models import BaseChatModel
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_core.runnables import Runnable, RunnableLambda
+
+### Token bucket
+
+class TokenBucket:
+    """ Requests-per-second limit with bursts of up to `capacity` requests """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """ Take one token and return how long the caller must wait before using it """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # A negative balance is a debt that is paid back at `rate` tokens per second
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_take(self) -> bool:
+        """ Take one token only if it is available now """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+### Concurrency limiter
+
+class ConcurrencyLimiter:
+    """ Caps in-flight calls, queues the rest first-in first-out, and holds the request rate limit
+
+    Works for both threads (sync nodes) and event loops (async nodes): a released slot is
+    handed straight to the oldest waiter, so late arrivals can't jump the queue. Slots only
+    cap concurrency (no cap when max_concurrency is None); the rate is spent per provider
+    request through throttle / athrottle, see ProviderRateLimiter.
+    """
+
+    def __init__(self, name: str, max_concurrency: Optional[int] = None, rate: Optional[float] = None, burst: Optional[float] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.lock = threading.Lock()
+        self.waiters = deque()
+        self.in_flight = 0
+        # Metrics
+        self.acquired = 0
+        self.max_queue_depth = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.throttled = 0
+        self.rate_wait_seconds_total = 0.0
+
+    def _enqueue(self, waiter) -> bool:
+        """ Take a free slot or join the queue; returns True if a slot was taken """
+        with self.lock:
+            if (self.max_concurrency is None or self.in_flight < self.max_concurrency) and not self.waiters:
+                self.in_flight += 1
+                return True
+            self.waiters.append(waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self.waiters))
+            return False
+
+    def _record(self, started: float) -> float:
+        waited = time.monotonic() - started
+        with self.lock:
+            self.acquired += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return waited
+
+    def acquire(self) -> float:
+        """ Wait for a slot; returns the seconds spent waiting """
+        started = time.monotonic()
+        event = threading.Event()
+        if not self._enqueue(event):
+            event.wait()
+        return self._record(started)
+
+    async def aacquire(self) -> float:
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._enqueue((loop, future)):
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self.lock:
+                    queued = (loop, future) in self.waiters
+                    if queued:
+                        self.waiters.remove((loop, future))
+                if not queued:
+                    # The slot was handed over as we were cancelled; pass it on
+                    self.release()
+                raise
+        return self._record(started)
+
+    def release(self):
+        with self.lock:
+            if not self.waiters:
+                self.in_flight -= 1
+                return
+            # Hand the slot over without decrementing in_flight
+            waiter = self.waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+    @contextmanager
+    def slot(self):
+        waited = self.acquire()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        waited = await self.aacquire()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def _reserve(self) -> float:
+        delay = self.bucket.reserve() if self.bucket else 0.0
+        with self.lock:
+            self.throttled += delay > 0
+            self.rate_wait_seconds_total += delay
+        return delay
+
+    def throttle(self) -> float:
+        """ Wait for one request's worth of the rate limit; returns the seconds spent waiting """
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def athrottle(self) -> float:
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {
+                "name": self.name,
+                "max_concurrency": self.max_concurrency,
+                "rate": self.bucket.rate if self.bucket else None,
+                "in_flight": self.in_flight,
+                "queue_depth": len(self.waiters),
+                "max_queue_depth": self.max_queue_depth,
+                "acquired": self.acquired,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": self.wait_seconds_total / self.acquired if self.acquired else 0.0,
+                "throttled": self.throttled,
+                "rate_wait_seconds_total": self.rate_wait_seconds_total,
+            }
+
+### Registry
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+def configure_limiter(name: str, max_concurrency: Optional[int] = None, rate: Optional[float] = None, burst: Optional[float] = None) -> ConcurrencyLimiter:
+    """ Create or replace the limiter called `name` (a graph name or a provider such as "openai") """
+    with limiters_lock:
+        limiters[name] = ConcurrencyLimiter(name, max_concurrency, rate, burst)
+        return limiters[name]
+
+def get_limiter(name: str) -> ConcurrencyLimiter:
+    """ Get a limiter, creating it from LIMITER_<NAME>_CONCURRENCY / _RATE / _BURST env vars on first use
+
+    Without those env vars the limiter neither caps concurrency nor rate limits.
+    """
+    with limiters_lock:
+        if name not in limiters:
+            prefix = f"LIMITER_{name.upper()}"
+            concurrency = os.environ.get(f"{prefix}_CONCURRENCY")
+            rate = os.environ.get(f"{prefix}_RATE")
+            burst = os.environ.get(f"{prefix}_BURST")
+            limiters[name] = ConcurrencyLimiter(
+                name,
+                int(concurrency) if concurrency else None,
+                float(rate) if rate else None,
+                float(burst) if burst else None,
+            )
+        return limiters[name]
+
+def limiter_metrics() -> list:
+    """ Queue depth and wait time for every limiter, to size the limits for a provider tier """
+    with limiters_lock:
+        return [limiter.metrics() for limiter in limiters.values()]
+
+### Model rate limiter
+
+class ProviderRateLimiter(BaseRateLimiter):
+    """ Spend the named limiter's rate on every model request: ChatOpenAI(..., rate_limiter=ProviderRateLimiter("openai"))
+
+    Chat models call it once per request that is not served from their cache, whichever node
+    makes the request, so LIMITER_<NAME>_RATE / _BURST bound the requests sent to the provider.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        limiter = get_limiter(self.name)
+        if not blocking:
+            return limiter.bucket is None or limiter.bucket.try_take()
+        limiter.throttle()
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        limiter = get_limiter(self.name)
+        if not blocking:
+            return limiter.bucket is None or limiter.bucket.try_take()
+        await limiter.athrottle()
+        return True
+
+### Node wrapper
+
+def limited(node, *names: str):
+    """ Wrap a node (function or compiled sub-graph) so every call holds a slot in each named limiter
+
+    Slots cap how many calls of a graph's branches run at once. Provider limits belong on the
+    model itself (provider_limited and ProviderRateLimiter), where they count requests rather
+    than whole branches. Slots are always taken in the order given. The time spent waiting is
+    reported to callbacks as a "queue_wait" custom event.
+    """
+
+    def invoke(state, config):
+        with ExitStack() as stack:
+            waited = sum(stack.enter_context(get_limiter(name).slot()) for name in names)
+            dispatch_custom_event("queue_wait", {"seconds": waited, "limiters": names}, config=config)
+            if isinstance(node, Runnable):
+                return node.invoke(state, config)
+            return node(state)
+
+    async def ainvoke(state, config):
+        async with AsyncExitStack() as stack:
+            waited = 0.0
+            for name in names:
+                waited += await stack.enter_async_context(get_limiter(name).aslot())
+            await adispatch_custom_event("queue_wait", {"seconds": waited, "limiters": names}, config=config)
+            if isinstance(node, Runnable):
+                return await node.ainvoke(state, config)
+            if inspect.iscoroutinefunction(node):
+                return await node(state)
+            return await asyncio.to_thread(node, state)
+
+    name = getattr(node, "__name__", None) or getattr(node, "name", None) or "limited"
+    return RunnableLambda(invoke, afunc=ainvoke, name=name)
+
+### Model concurrency
+
+# Set while a request holds its provider slot, so a model method that calls another
+# (ChatOpenAI's _generate streaming through _stream, the default _agenerate running
+# _generate in a thread) doesn't queue for a second slot
+holding_provider_slot = contextvars.ContextVar("holding_provider_slot", default=False)
+provider_classes = {}
+
+def provider_limited(model: BaseChatModel, name: str) -> BaseChatModel:
+    """ Hold a slot in the named limiter for every request the chat model sends
+
+    LIMITER_<NAME>_CONCURRENCY then caps the requests in flight to the provider, across every
+    node and graph using the model; time spent in tools and searches between requests holds
+    no slot. The model keeps its class (it becomes a subclass of it), so it's still a
+    ChatOpenAI for with_structured_output, bind_tools and structured_output.
+    """
+    base = type(model)
+    if base in provider_classes.values():
+        # Already limited, e.g. a model instance shared by two graphs
+        return model
+    key = (base, name)
+    if key not in provider_classes:
+        provider_classes[key] = provider_class(base, name)
+    model.__class__ = provider_classes[key]
+    return model
+
+def provider_class(base: type, name: str) -> type:
+    @contextmanager
+    def slot():
+        if holding_provider_slot.get():
+            yield
+            return
+        with get_limiter(name).slot():
+            token = holding_provider_slot.set(True)
+            try:
+                yield
+            finally:
+                holding_provider_slot.reset(token)
+
+    @asynccontextmanager
+    async def aslot():
+        if holding_provider_slot.get():
+            yield
+            return
+        async with get_limiter(name).aslot():
+            token = holding_provider_slot.set(True)
+            try:
+                yield
+            finally:
+                holding_provider_slot.reset(token)
+
+    def _generate(self, *args, **kwargs):
+        with slot():
+            return base._generate(self, *args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        async with aslot():
+            return await base._agenerate(self, *args, **kwargs)
+
+    def _stream(self, *args, **kwargs):
+        with slot():
+            yield from base._stream(self, *args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        async with aslot():
+            async for chunk in base._astream(self, *args, **kwargs):
+                yield chunk
+
+    methods = {"__module__": base.__module__, "__qualname__": base.__qualname__,
+               "_generate": _generate, "_agenerate": _agenerate}
+    # BaseChatModel only streams from models that implement these, so don't add them
+    if base._stream is not BaseChatModel._stream:
+        methods["_stream"] = _stream
+    if base._astream is not BaseChatModel._astream:
+        methods["_astream"] = _astream
+    return type(base.__name__, (base,), methods)
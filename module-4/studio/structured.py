@@ -0,0 +1,58 @@
+import threading
+
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    from langchain_openai.chat_models.base import ChatOpenAI, OpenAIRefusalError
+    from openai import pydantic_function_tool
+except ImportError:
+    pydantic_function_tool = None
+
+### Structured output registry
+#
+# llm.with_structured_output(Schema) inside a node rebuilds the runnable (and its JSON schema)
+# on every call, and with ChatOpenAI the OpenAI SDK then converts the pydantic class into a
+# strict JSON schema again for every request. structured_output builds the runnable once per
+# (model, schema):
+# - for ChatOpenAI, the response_format the SDK would send is computed once and bound as is,
+#   and the reply is validated straight from its JSON text with a reused pydantic TypeAdapter
+# - for other models, with_structured_output(schema) is built once and reused
+
+structured_runnables = {} # (id(model), schema) -> (model, runnable)
+structured_lock = threading.Lock()
+
+def structured_output(model, schema) -> Runnable:
+    """ Cached equivalent of model.with_structured_output(schema) """
+    key = (id(model), schema)
+    with structured_lock:
+        # The model is kept in the entry, so its id can't be reused by another model
+        entry = structured_runnables.get(key)
+        if entry is None:
+            entry = structured_runnables[key] = (model, compile_structured_output(model, schema))
+        return entry[1]
+
+def compile_structured_output(model, schema) -> Runnable:
+    if (pydantic_function_tool is None or not isinstance(model, ChatOpenAI) or model.use_responses_api
+            or not (isinstance(schema, type) and issubclass(schema, BaseModel))):
+        return model.with_structured_output(schema)
+
+    # The strict schema the SDK sends for response_format=schema, through its public tool helper
+    function = pydantic_function_tool(schema)["function"]
+    response_format = {"type": "json_schema",
+                       "json_schema": {"schema": function["parameters"], "name": function["name"], "strict": True}}
+    adapter = TypeAdapter(schema)
+
+    def parse(message):
+        if message.additional_kwargs.get("refusal"):
+            raise OpenAIRefusalError(message.additional_kwargs["refusal"])
+        return adapter.validate_json(message.content)
+
+    bound = model.bind(
+        response_format=response_format,
+        # What with_structured_output reports to tracing
+        ls_structured_output_format={"kwargs": {"method": "json_schema", "strict": None},
+                                     "schema": convert_to_openai_tool(schema)},
+    )
+    return bound | RunnableLambda(parse, name=f"parse_{schema.__name__}")